@@ -33,23 +33,35 @@ Dependencies: requests, msal
 from __future__ import annotations
 
 import argparse
+import hashlib
+import html
 import json
 import logging
 import os
 import re
+import signal
+import sqlite3
 import sys
+import threading
 import time
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import Any, Iterator
+from typing import Any, Callable, Iterator
 from urllib.parse import quote, urlencode
 
 import requests
-from msal import ConfidentialClientApplication
+from msal import ConfidentialClientApplication, SerializableTokenCache, TokenCache
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
 # ─── LOGGING ──────────────────────────────────────────────────────────────────
 
 logging.basicConfig(
@@ -63,15 +75,100 @@ log = logging.getLogger("intune2snipe")
 
 DEFAULT_TIMEOUT = 30
 GRAPH_TOKEN_SKEW_SECONDS = 300
+# Background refresh runs this long before the token enters the skew window.
+GRAPH_TOKEN_REFRESH_MARGIN_SECONDS = 60
+GRAPH_SCOPES = ["https://graph.microsoft.com/.default"]
 GRAPH_BATCH_SIZE = 20
+GRAPH_BATCH_MAX_ATTEMPTS = 5
+GRAPH_BATCH_MAX_RETRY_AFTER = 60
+GRAPH_BATCH_RETRY_STATUSES = frozenset({429, 503, 504})
+# Statuses Graph uses when a stored delta token can no longer be used.
+GRAPH_DELTA_EXPIRED_STATUSES = frozenset({400, 404, 410})
+# Azure AD device ids per managedDevices ``$filter`` (OR clauses are capped).
+GRAPH_DEVICE_ID_FILTER_SIZE = 15
 SNIPE_PAGE_SIZE = 200
+HTTP_POOL_SIZE = 10
+
+# Reserved sync-state key holding run metadata (watermarks etc.), not a serial.
+SYNC_STATE_META_KEY = "_intune2snipe"
+SYNC_STATE_BACKENDS = frozenset({"json", "sqlite"})
+SQLITE_HEADER = b"SQLite format 3\x00"
+# Device rows buffered before a SQLite transaction is committed mid-run.
+SQLITE_UPSERT_BATCH = 500
 
 GUID_PREFIX = re.compile(r"^[0-9a-f]{32}")
 
+# managedDevice properties only populated by GET /managedDevices/{id}, not the list.
+DETAIL_ONLY_DEVICE_PROPERTIES = frozenset({
+    "hardwareInformation",
+    "physicalMemoryInBytes",
+    "configurationManagerClientEnabledFeatures",
+    "deviceHealthAttestationState",
+})
+
+# v1.0 managedDevice properties that may be added to a managedDevices $select.
+# An unknown property there fails the whole listing with HTTP 400.
+MANAGED_DEVICE_PROPERTIES = frozenset({
+    "id",
+    "userId",
+    "deviceName",
+    "managedDeviceOwnerType",
+    "enrolledDateTime",
+    "lastSyncDateTime",
+    "operatingSystem",
+    "complianceState",
+    "jailBroken",
+    "managementAgent",
+    "osVersion",
+    "easActivated",
+    "easDeviceId",
+    "easActivationDateTime",
+    "azureADRegistered",
+    "deviceEnrollmentType",
+    "activationLockBypassCode",
+    "emailAddress",
+    "azureADDeviceId",
+    "deviceRegistrationState",
+    "deviceCategoryDisplayName",
+    "isSupervised",
+    "exchangeLastSuccessfulSyncDateTime",
+    "exchangeAccessState",
+    "exchangeAccessStateReason",
+    "remoteAssistanceSessionUrl",
+    "remoteAssistanceSessionErrorDetails",
+    "isEncrypted",
+    "userPrincipalName",
+    "model",
+    "manufacturer",
+    "imei",
+    "complianceGracePeriodExpirationDateTime",
+    "serialNumber",
+    "phoneNumber",
+    "androidSecurityPatchLevel",
+    "userDisplayName",
+    "wiFiMacAddress",
+    "subscriberCarrier",
+    "meid",
+    "totalStorageSpaceInBytes",
+    "freeStorageSpaceInBytes",
+    "managedDeviceName",
+    "partnerReportedThreatState",
+    "requireUserEnrollmentApproval",
+    "managementCertificateExpirationDate",
+    "iccid",
+    "udid",
+    "notes",
+    "ethernetMacAddress",
+    "enrollmentProfileName",
+    "deviceActionResults",
+    "managementState",
+})
+
+# managedDevice properties the sync itself reads; custom-field keys are added per run.
 MANAGED_DEVICE_SELECT = (
     "id,deviceName,serialNumber,manufacturer,model,userPrincipalName,emailAddress,"
     "operatingSystem,azureADDeviceId,osVersion,complianceState,lastSyncDateTime,"
-    "managedDeviceOwnerType,imei,meid,wiFiMacAddress,managementState"
+    "managedDeviceOwnerType,managementState"
 )
 
 PLATFORM_ODATA_FILTERS: dict[str, str] = {
@@ -120,6 +217,32 @@ AUTOPILOT_CUSTOM_FIELD_ENV: dict[str, str] = {
     "lastContactedDateTime": "SNIPEIT_CF_AUTOPILOT_LAST_CONTACTED",
 }
 
+# ``_asset_notes`` segments that change on every Intune check-in.
+VOLATILE_NOTE_PREFIXES = ("last sync ", "autopilot contacted ")
+
+# How volatile note segments count when diffing an update against the asset.
+NOTES_CHANGE_POLICIES = frozenset({"always", "stable", "ignore"})
+
+# Update payload keys -> nested Snipe-IT asset object holding the current id.
+ASSET_RELATION_FIELDS: dict[str, str] = {
+    "model_id": "model",
+    "status_id": "status_label",
+    "manufacturer_id": "manufacturer",
+    "company_id": "company",
+}
+
+# Intune fields that feed the Snipe-IT payload (custom field keys are added per config).
+FINGERPRINT_DEVICE_FIELDS = (
+    "deviceName",
+    "serialNumber",
+    "manufacturer",
+    "model",
+    "osVersion",
+    "complianceState",
+    "managementState",
+    "managedDeviceOwnerType",
+)
+
 BUILTIN_DEFAULT_STATUS = "Ready to Deploy"
 BUILTIN_STATUS_PENDING_AUTOPILOT = "Pending Autopilot"
 BUILTIN_STATUS_PENDING_RETIRE = "Pending Retire"
@@ -138,7 +261,16 @@ class SnipeAPIError(Exception):
     """Snipe-IT returned HTTP 200 with status=error in the JSON body."""
 
 
-def _http_session() -> requests.Session:
+class StartupError(Exception):
+    """A required Snipe-IT setting is missing; the sync cannot start."""
+
+
+class GraphCancelled(Exception):
+    """A Graph request was refused because the run is stopping."""
+
+
+def _http_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """Session with retries; ``pool_size`` should cover concurrent workers per host."""
     retry = Retry(
         total=5,
         connect=5,
@@ -149,7 +281,10 @@ def _http_session() -> requests.Session:
         raise_on_status=False,
         respect_retry_after_header=True,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    pool_size = max(pool_size, HTTP_POOL_SIZE)
+    adapter = HTTPAdapter(
+        max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size
+    )
     session = requests.Session()
     session.mount("https://", adapter)
     session.mount("http://", adapter)
@@ -195,6 +330,17 @@ def _parse_int_env(name: str, default: int | None = None) -> int | None:
         return default
 
 
+def _parse_float_env(name: str, default: float) -> float:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        log.warning("Invalid number for %s=%r", name, raw)
+        return default
+
+
 def _env_status_name(env_key: str, builtin_default: str) -> tuple[str, bool]:
     """Return status label name and whether missing labels may be auto-created."""
     raw = os.getenv(env_key, "").strip()
@@ -232,9 +378,34 @@ class SyncConfig:
     auto_create_pending_autopilot: bool = True
     auto_create_pending_retire: bool = True
     auto_create_archived: bool = True
+    workers: int = 1
+    preload_assets: bool = False
+    notes_change_policy: str = "stable"
+    sync_state_backend: str = "json"
+    checkpoint_interval: int = 0
+    state_retention_days: int = 90
+    preload_users: bool = False
+    preload_locations: bool = False
+    location_map_file: str | None = None
+    preload_taxonomy: bool = False
+    incremental_sync: bool = False
+    incremental_skew_minutes: int = 15
+    full_sync_interval_hours: int = 24
+    graph_batch_workers: int = 4
+    group_transitive: bool = False
+    group_delta: bool = False
+    group_filter_ratio: float = 0.0
+    parallel_platforms: bool = False
+    skip_unchanged_devices: bool = False
+    force_refresh_hours: int = 168
 
     @classmethod
-    def from_env(cls, *, use_primary_user_cli: bool | None = None) -> SyncConfig:
+    def from_env(
+        cls,
+        *,
+        use_primary_user_cli: bool | None = None,
+        workers_cli: int | None = None,
+    ) -> SyncConfig:
         checkout_status = os.getenv("SNIPEIT_CHECKOUT_STATUS", "").strip() or None
         checkin_status = os.getenv("SNIPEIT_CHECKIN_STATUS", "").strip() or None
         default_name, auto_default = _env_status_name(
@@ -256,6 +427,12 @@ class SyncConfig:
             else _parse_bool_env("GRAPH_USE_PRIMARY_USER", False)
         )
         custom_fields = _build_custom_field_map()
+        state_backend = _normalize_state_backend(os.getenv("SYNC_STATE_BACKEND", "json"))
+        workers = (
+            workers_cli
+            if workers_cli is not None
+            else _parse_int_env("SYNC_WORKERS", 1)
+        )
         return cls(
             checkout_mode=_normalize_checkout_mode(
                 os.getenv("SNIPEIT_CHECKOUT_MODE", "user")
@@ -265,6 +442,15 @@ class SyncConfig:
             company_id=_parse_int_env("SNIPEIT_COMPANY_ID"),
             stale_days=_parse_int_env("SNIPEIT_STALE_DAYS"),
             sync_state_file=os.getenv("SYNC_STATE_FILE", "").strip() or None,
+            sync_state_backend=state_backend,
+            state_retention_days=max(0, _parse_int_env("SYNC_STATE_RETENTION_DAYS", 90) or 0),
+            checkpoint_interval=max(
+                0,
+                _parse_int_env(
+                    "SYNC_CHECKPOINT_INTERVAL", 100 if state_backend == "sqlite" else 0
+                )
+                or 0,
+            ),
             include_deleted_assets=_parse_bool_env("SNIPEIT_INCLUDE_DELETED_ASSETS", False),
             checkout_on_create=not _parse_bool_env("SNIPEIT_SKIP_CHECKOUT_ON_CREATE", False),
             custom_fields=custom_fields,
@@ -286,9 +472,40 @@ class SyncConfig:
             auto_create_pending_autopilot=auto_create_enabled and auto_ap,
             auto_create_pending_retire=auto_create_enabled and auto_retire,
             auto_create_archived=auto_create_enabled and auto_archived,
+            workers=max(1, workers or 1),
+            preload_assets=_parse_bool_env("SNIPEIT_PRELOAD_ASSETS", False),
+            notes_change_policy=_normalize_notes_policy(
+                os.getenv("SNIPEIT_NOTES_CHANGE_POLICY", "stable")
+            ),
+            preload_users=_parse_bool_env("SNIPEIT_PRELOAD_USERS", False),
+            preload_locations=_parse_bool_env("SNIPEIT_PRELOAD_LOCATIONS", False),
+            location_map_file=os.getenv("SNIPEIT_LOCATION_MAP_FILE", "").strip() or None,
+            preload_taxonomy=_parse_bool_env("SNIPEIT_PRELOAD_TAXONOMY", False),
+            incremental_sync=_parse_bool_env("SYNC_INCREMENTAL", False),
+            incremental_skew_minutes=max(
+                0, _parse_int_env("SYNC_INCREMENTAL_SKEW_MINUTES", 15) or 0
+            ),
+            full_sync_interval_hours=max(
+                0, _parse_int_env("SYNC_FULL_SYNC_INTERVAL_HOURS", 24) or 0
+            ),
+            graph_batch_workers=max(1, _parse_int_env("GRAPH_BATCH_WORKERS", 4) or 1),
+            group_transitive=_parse_bool_env("AZURE_GROUP_TRANSITIVE", False),
+            group_delta=_parse_bool_env("AZURE_GROUP_DELTA", False),
+            group_filter_ratio=max(0.0, _parse_float_env("GRAPH_GROUP_FILTER_RATIO", 0.0)),
+            parallel_platforms=_parse_bool_env("GRAPH_PARALLEL_PLATFORMS", False),
+            skip_unchanged_devices=_parse_bool_env("SYNC_SKIP_UNCHANGED", False),
+            force_refresh_hours=max(
+                0, _parse_int_env("SYNC_FORCE_REFRESH_HOURS", 168) or 0
+            ),
         )
 
 
+def _enrichment_fields(custom_fields: dict[str, str]) -> list[str]:
+    """Mapped properties that need a per-device Graph read."""
+    roots = (key.split(".", 1)[0] for key in custom_fields)
+    return sorted({root for root in roots if root in DETAIL_ONLY_DEVICE_PROPERTIES})
+
+
 def _build_custom_field_map() -> dict[str, str]:
     """Map Intune property names to Snipe-IT custom field DB column names."""
     mapping: dict[str, str] = {}
@@ -304,22 +521,138 @@ def _build_custom_field_map() -> dict[str, str]:
     return mapping
 
 
+def load_location_map(path: str | None) -> dict[str, int]:
+    """Read a JSON object of UPN prefix -> Snipe-IT location id (keys casefolded)."""
+    if not path:
+        return {}
+    try:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, json.JSONDecodeError) as exc:
+        log.warning("Could not read location map from %s: %s", path, exc)
+        return {}
+    if not isinstance(data, dict):
+        log.warning("Location map %s must be a JSON object", path)
+        return {}
+    mapping: dict[str, int] = {}
+    for prefix, location_id in data.items():
+        try:
+            mapping[str(prefix).casefold()] = int(location_id)
+        except (TypeError, ValueError):
+            log.warning("Invalid location id %r for prefix %r in %s", location_id, prefix, path)
+    log.info("Loaded %d location prefix mapping(s) from %s", len(mapping), path)
+    return mapping
+
+
+@dataclass
+class _PrefixNode:
+    location_id: int | None = None
+    children: dict[str, _PrefixNode] = field(default_factory=dict)
+
+
+class LocationPrefixIndex:
+    """Trie over casefolded location names; lookups cost O(prefix length).
+
+    Each node keeps the first location id inserted beneath it, so a prefix
+    resolves to the first location (in load order) whose name starts with it.
+    """
+
+    def __init__(self) -> None:
+        self._root = _PrefixNode()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, name: str, location_id: int) -> None:
+        node = self._root
+        for char in name.casefold():
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _PrefixNode()
+            if child.location_id is None:
+                child.location_id = location_id
+            node = child
+        self._size += 1
+
+    def lookup(self, prefix: str) -> int | None:
+        node = self._root
+        for char in prefix.casefold():
+            child = node.children.get(char)
+            if child is None:
+                return None
+            node = child
+        return node.location_id
+
+
 # ─── CLIENTS ──────────────────────────────────────────────────────────────────
 
 
 class GraphClient:
     """Microsoft Graph API client using MSAL client credentials."""
 
-    def __init__(self) -> None:
+    def __init__(self, *, pool_size: int = HTTP_POOL_SIZE) -> None:
         self._token: str | None = None
         self._token_expires_at: float | None = None
         self._tenant_id = os.getenv("AZURE_TENANT_ID", "")
         self._client_id = os.getenv("AZURE_CLIENT_ID", "")
         self._client_secret = os.getenv("AZURE_CLIENT_SECRET", "")
         self._app: ConfidentialClientApplication | None = None
-        self._session = _http_session()
+        self._token_cache_file = os.getenv("GRAPH_TOKEN_CACHE_FILE", "").strip() or None
+        self._token_cache = SerializableTokenCache()
+        self._load_token_cache()
+        self._session = _http_session(pool_size)
+        self._auth_lock = threading.RLock()
+        self._refresh_stop = threading.Event()
+        self._refresh_thread: threading.Thread | None = None
+        self._cancelled = threading.Event()
+
+    def _load_token_cache(self) -> None:
+        if not self._token_cache_file or not os.path.isfile(self._token_cache_file):
+            return
+        try:
+            with open(self._token_cache_file, encoding="utf-8") as fh:
+                self._token_cache.deserialize(fh.read())
+        except (OSError, ValueError) as exc:
+            log.warning(
+                "Ignoring unreadable Graph token cache %s: %s", self._token_cache_file, exc
+            )
+
+    def _save_token_cache(self) -> None:
+        if not self._token_cache_file or not self._token_cache.has_state_changed:
+            return
+        tmp_path = f"{self._token_cache_file}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                fh.write(self._token_cache.serialize())
+            os.replace(tmp_path, self._token_cache_file)
+            self._token_cache.has_state_changed = False
+        except OSError as exc:
+            log.warning(
+                "Could not write Graph token cache %s: %s", self._token_cache_file, exc
+            )
+
+    def _msal_app(self) -> ConfidentialClientApplication:
+        if self._app is None:
+            if not self._tenant_id or not self._client_id or not self._client_secret:
+                raise RuntimeError(
+                    "Azure credentials not configured. Set AZURE_TENANT_ID, "
+                    "AZURE_CLIENT_ID, and AZURE_CLIENT_SECRET environment variables."
+                )
+            self._app = ConfidentialClientApplication(
+                client_id=self._client_id,
+                client_credential=self._client_secret,
+                authority=f"https://login.microsoftonline.com/{self._tenant_id}",
+                token_cache=self._token_cache,
+            )
+        return self._app
 
     def _ensure_auth(self) -> None:
+        with self._auth_lock:
+            self._ensure_auth_locked()
+
+    def _ensure_auth_locked(self) -> None:
         now = time.time()
         if (
             self._token
@@ -330,19 +663,8 @@ class GraphClient:
 
         self._token = None
         self._token_expires_at = None
-        if not self._tenant_id or not self._client_id or not self._client_secret:
-            raise RuntimeError(
-                "Azure credentials not configured. Set AZURE_TENANT_ID, "
-                "AZURE_CLIENT_ID, and AZURE_CLIENT_SECRET environment variables."
-            )
-        self._app = ConfidentialClientApplication(
-            client_id=self._client_id,
-            client_credential=self._client_secret,
-            authority=f"https://login.microsoftonline.com/{self._tenant_id}",
-        )
-        result = self._app.acquire_token_for_client(
-            scopes=["https://graph.microsoft.com/.default"]
-        )
+        # MSAL answers from its token cache while a cached token is still valid.
+        result = self._msal_app().acquire_token_for_client(scopes=GRAPH_SCOPES)
         if "access_token" not in result:
             raise RuntimeError(
                 f"Failed to acquire Graph access token: {result.get('error_description', result)}"
@@ -350,22 +672,70 @@ class GraphClient:
         self._token = result["access_token"]
         expires_in = int(result.get("expires_in", 3600))
         self._token_expires_at = time.time() + expires_in
+        self._save_token_cache()
         log.info(
-            "Authenticated with Microsoft Graph (access token expires in %s seconds)",
+            "Authenticated with Microsoft Graph (%s access token expires in %s seconds)",
+            "cached" if result.get("token_source") == "cache" else "new",
             expires_in,
         )
 
     def _refresh_token(self) -> None:
-        self._token = None
-        self._token_expires_at = None
-        self._ensure_auth()
+        """Drop the current token (also from MSAL's cache) and acquire a new one."""
+        with self._auth_lock:
+            self._token = None
+            self._token_expires_at = None
+            cached = list(self._token_cache.search(TokenCache.CredentialType.ACCESS_TOKEN))
+            for entry in cached:
+                self._token_cache.remove_at(entry)
+            self._ensure_auth_locked()
+
+    def start_background_refresh(self) -> None:
+        """Refresh the token on a daemon thread before it reaches the skew window."""
+        if self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(
+            target=self._background_refresh, name="graph-token-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def stop_background_refresh(self) -> None:
+        self._refresh_stop.set()
+
+    def _background_refresh(self) -> None:
+        while not self._refresh_stop.is_set():
+            expires_at = self._token_expires_at
+            if expires_at is None:
+                wait = GRAPH_TOKEN_REFRESH_MARGIN_SECONDS
+            else:
+                wait = max(
+                    expires_at
+                    - GRAPH_TOKEN_SKEW_SECONDS
+                    - GRAPH_TOKEN_REFRESH_MARGIN_SECONDS
+                    - time.time(),
+                    0.0,
+                )
+            if self._refresh_stop.wait(wait):
+                return
+            if self._token_expires_at is None:
+                continue
+            try:
+                self._refresh_token()
+            except Exception as exc:
+                log.warning("Background Graph token refresh failed: %s", exc)
+                self._refresh_stop.wait(GRAPH_TOKEN_REFRESH_MARGIN_SECONDS)
 
     def _headers(self) -> dict[str, str]:
         self._ensure_auth()
         assert self._token is not None
         return {"Authorization": f"Bearer {self._token}"}
 
+    def cancel(self) -> None:
+        """Make every later request raise GraphCancelled (running ones finish)."""
+        self._cancelled.set()
+
     def _request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        if self._cancelled.is_set():
+            raise GraphCancelled(url)
         resp = self._session.request(
             method, url, headers=self._headers(), timeout=DEFAULT_TIMEOUT, **kwargs
         )
@@ -377,59 +747,206 @@ class GraphClient:
         resp.raise_for_status()
         return resp
 
+    def iter_paginated(self, url: str) -> Iterator[dict]:
+        """Yield items from a Graph API endpoint one page at a time."""
+        while url:
+            data = self._request("GET", url).json()
+            yield from data.get("value", [])
+            url = data.get("@odata.nextLink")
+
     def get_paginated(self, url: str) -> list[dict]:
         """Fetch all pages from a Graph API endpoint."""
-        results: list[dict] = []
+        return list(self.iter_paginated(url))
+
+    def get_count(self, url: str) -> int | None:
+        """Return ``@odata.count`` for a collection query, or None if unavailable."""
+        sep = "&" if "?" in url else "?"
+        try:
+            data = self._request("GET", f"{url}{sep}$count=true&$top=1").json()
+        except requests.exceptions.RequestException as e:
+            log.debug("Graph $count failed for %s: %s", url, e)
+            return None
+        count = data.get("@odata.count")
+        return count if isinstance(count, int) else None
+
+    def get_delta(self, url: str) -> tuple[list[dict], str | None]:
+        """Follow a delta query to the end; return its items and ``@odata.deltaLink``."""
+        items: list[dict] = []
+        delta_link: str | None = None
         while url:
             data = self._request("GET", url).json()
-            results.extend(data.get("value", []))
+            items.extend(data.get("value", []))
+            delta_link = data.get("@odata.deltaLink", delta_link)
             url = data.get("@odata.nextLink")
+        return items, delta_link
+
+    def _post_batch(self, api_version: str, chunk: list[dict]) -> list[dict]:
+        data = self._request(
+            "POST",
+            f"https://graph.microsoft.com/{api_version}/$batch",
+            json={"requests": chunk},
+        ).json()
+        return data.get("responses", [])
+
+    def batch(
+        self,
+        sub_requests: list[dict],
+        *,
+        api_version: str = "v1.0",
+        max_workers: int = 1,
+    ) -> dict[str, dict]:
+        """Run sub-requests through JSON batching; return responses keyed by id.
+
+        Each sub-request carries a caller-chosen unique ``id`` plus ``method``
+        and ``url`` (relative to ``api_version``). Envelopes hold up to 20
+        requests and up to ``max_workers`` are in flight at once. Throttled
+        sub-requests (429/503/504) are re-queued with backoff that honours
+        their own ``Retry-After``; the last response is returned if they
+        never succeed.
+        """
+        pending = {str(req["id"]): {**req, "id": str(req["id"])} for req in sub_requests}
+        results: dict[str, dict] = {}
+        for attempt in range(GRAPH_BATCH_MAX_ATTEMPTS):
+            if not pending:
+                break
+            queued = list(pending.values())
+            chunks = [
+                queued[i : i + GRAPH_BATCH_SIZE]
+                for i in range(0, len(queued), GRAPH_BATCH_SIZE)
+            ]
+            responses: list[dict] = []
+            if max_workers <= 1 or len(chunks) <= 1:
+                for chunk in chunks:
+                    responses.extend(self._post_batch(api_version, chunk))
+            else:
+                with ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix="graph-batch"
+                ) as pool:
+                    for chunk_responses in pool.map(
+                        lambda chunk: self._post_batch(api_version, chunk), chunks
+                    ):
+                        responses.extend(chunk_responses)
+
+            last_attempt = attempt == GRAPH_BATCH_MAX_ATTEMPTS - 1
+            retry: dict[str, dict] = {}
+            delay = 0.0
+            for item in responses:
+                req_id = str(item.get("id"))
+                if req_id not in pending:
+                    continue
+                if item.get("status") in GRAPH_BATCH_RETRY_STATUSES and not last_attempt:
+                    retry[req_id] = pending[req_id]
+                    delay = max(delay, _batch_retry_delay(item, attempt))
+                else:
+                    results[req_id] = item
+            for req_id, req in pending.items():
+                if req_id not in results and req_id not in retry and not last_attempt:
+                    retry[req_id] = req
+                    delay = max(delay, _batch_retry_delay({}, attempt))
+            pending = retry
+            if pending:
+                log.info(
+                    "Retrying %d throttled Graph batch sub-request(s) in %.1fs",
+                    len(pending),
+                    delay,
+                )
+                time.sleep(delay)
         return results
 
-    def fetch_primary_user_upns(self, managed_device_ids: list[str]) -> dict[str, str]:
-        """Resolve primary user UPNs via beta ``/managedDevices/{id}/users`` ($batch)."""
+    def fetch_device_details(
+        self, managed_device_ids: list[str], fields: list[str], *, max_workers: int = 1
+    ) -> dict[str, dict]:
+        """Read ``fields`` per device via beta ``/managedDevices/{id}`` ($batch).
+
+        For properties the list endpoint leaves empty. Failed reads are omitted.
+        """
+        if not managed_device_ids or not fields:
+            return {}
+
+        device_ids = list(dict.fromkeys(managed_device_ids))
+        select = urlencode({"$select": ",".join(fields)}, safe=",")
+        responses = self.batch(
+            [
+                {
+                    "id": dev_id,
+                    "method": "GET",
+                    "url": f"/deviceManagement/managedDevices/{dev_id}?{select}",
+                }
+                for dev_id in device_ids
+            ],
+            api_version="beta",
+            max_workers=max_workers,
+        )
+        details: dict[str, dict] = {}
+        for device_id in device_ids:
+            item = responses.get(device_id)
+            if item is None:
+                continue
+            if item.get("status") != 200:
+                log.debug(
+                    "Device detail read failed for device %s: HTTP %s",
+                    device_id,
+                    item.get("status"),
+                )
+                continue
+            body = item.get("body") or {}
+            details[device_id] = {f: body.get(f) for f in fields}
+
+        log.info(
+            "Read %s for %d of %d device(s) via Graph batch",
+            ",".join(fields),
+            len(details),
+            len(device_ids),
+        )
+        return details
+
+    def fetch_primary_user_upns(
+        self, managed_device_ids: list[str], *, max_workers: int = 1
+    ) -> dict[str, str | None]:
+        """Resolve primary user UPNs via beta ``/managedDevices/{id}/users`` ($batch).
+
+        Devices that were looked up but have no primary user map to None;
+        failed lookups are omitted. Up to ``max_workers`` batches run at once.
+        """
         if not managed_device_ids:
             return {}
 
-        upn_by_device: dict[str, str] = {}
-        for i in range(0, len(managed_device_ids), GRAPH_BATCH_SIZE):
-            chunk = managed_device_ids[i : i + GRAPH_BATCH_SIZE]
-            requests_payload = [
+        device_ids = list(dict.fromkeys(managed_device_ids))
+        responses = self.batch(
+            [
                 {
-                    "id": str(idx),
+                    "id": dev_id,
                     "method": "GET",
-                    "url": f"/beta/deviceManagement/managedDevices/{dev_id}/users",
+                    "url": f"/deviceManagement/managedDevices/{dev_id}/users",
                 }
-                for idx, dev_id in enumerate(chunk)
-            ]
-            batch_url = "https://graph.microsoft.com/v1.0/$batch"
-            data = self._request(
-                "POST", batch_url, json={"requests": requests_payload}
-            ).json()
-            for item in data.get("responses", []):
-                req_id = int(item.get("id", -1))
-                if req_id < 0 or req_id >= len(chunk):
-                    continue
-                device_id = chunk[req_id]
-                if item.get("status") != 200:
-                    log.debug(
-                        "Primary user lookup failed for device %s: HTTP %s",
-                        device_id,
-                        item.get("status"),
-                    )
-                    continue
-                body = item.get("body") or {}
-                users = body.get("value") or []
-                if not users:
-                    continue
+                for dev_id in device_ids
+            ],
+            api_version="beta",
+            max_workers=max_workers,
+        )
+        upn_by_device: dict[str, str | None] = {}
+        for device_id in device_ids:
+            item = responses.get(device_id)
+            if item is None:
+                continue
+            if item.get("status") != 200:
+                log.debug(
+                    "Primary user lookup failed for device %s: HTTP %s",
+                    device_id,
+                    item.get("status"),
+                )
+                continue
+            body = item.get("body") or {}
+            users = body.get("value") or []
+            upn: str | None = None
+            if users:
                 user = users[0]
                 upn = user.get("userPrincipalName") or user.get("mail")
-                if upn:
-                    upn_by_device[device_id] = upn
+            upn_by_device[device_id] = upn or None
 
         log.info(
             "Resolved primary user for %d of %d device(s) via Graph batch",
-            len(upn_by_device),
+            sum(1 for upn in upn_by_device.values() if upn),
             len(managed_device_ids),
         )
         return upn_by_device
@@ -438,7 +955,10 @@ class GraphClient:
         """Index Windows Autopilot identities by serial number (lowercase key)."""
         by_serial: dict[str, dict] = {}
         try:
-            records = self.get_paginated(AUTOPILOT_URL)
+            for record in self.iter_paginated(AUTOPILOT_URL):
+                serial = (record.get("serialNumber") or "").strip()
+                if serial:
+                    by_serial[serial.casefold()] = record
         except requests.exceptions.HTTPError as exc:
             if exc.response is not None and exc.response.status_code == 403:
                 log.warning(
@@ -448,16 +968,23 @@ class GraphClient:
                 )
             else:
                 log.warning("Failed to fetch Autopilot devices: %s", exc)
-            return by_serial
-        for record in records:
-            serial = (record.get("serialNumber") or "").strip()
-            if not serial:
-                continue
-            by_serial[serial.casefold()] = record
+            return {}
         log.info("Loaded %d Windows Autopilot device(s) by serial", len(by_serial))
         return by_serial
 
 
+def _batch_retry_delay(item: dict, attempt: int) -> float:
+    """Seconds to wait before re-sending a throttled batch sub-request."""
+    headers = item.get("headers") or {}
+    for key, value in headers.items():
+        if key.casefold() == "retry-after":
+            try:
+                return min(float(value), GRAPH_BATCH_MAX_RETRY_AFTER)
+            except (TypeError, ValueError):
+                break
+    return min(0.5 * (2 ** attempt), GRAPH_BATCH_MAX_RETRY_AFTER)
+
+
 class SnipeITClient:
     """Snipe-IT API client."""
 
@@ -470,13 +997,25 @@ class SnipeITClient:
                 "Snipe-IT credentials not configured. Set SNIPEIT_URL and "
                 "SNIPEIT_API_TOKEN environment variables."
             )
-        self._session = _http_session()
+        self._session = _http_session(config.workers)
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple[str, str], threading.RLock] = {}
         self._category_cache: dict[str, int] = {}
         self._manufacturer_cache: dict[str, int] = {}
         self._model_cache: dict[str, int] = {}
         self._status_cache: dict[str, int] = {}
+        self._status_missing: set[str] = set()
+        self._status_labels_loaded = False
         self._user_cache: dict[str, int | None] = {}
         self._location_cache: dict[str, int | None] = {}
+        self._asset_index: dict[str, dict] | None = None
+        self._user_email_index: dict[str, int] | None = None
+        self._user_username_index: dict[str, int] | None = None
+        self._location_index: LocationPrefixIndex | None = None
+        self._category_index: dict[str, int] | None = None
+        self._manufacturer_index: dict[str, int] | None = None
+        self._model_index: dict[str, int] | None = None
+        self._location_map = load_location_map(config.location_map_file)
         self._checkout_status_id: int | None = None
         self._checkin_status_id: int | None = None
 
@@ -490,6 +1029,14 @@ class SnipeITClient:
     def _url(self, path: str) -> str:
         return f"{self._base_url}{path}"
 
+    def _key_lock(self, namespace: str, key: str) -> threading.RLock:
+        """Per-key lock so concurrent workers resolve each cache miss only once."""
+        with self._lock:
+            lock = self._key_locks.get((namespace, key))
+            if lock is None:
+                lock = self._key_locks[(namespace, key)] = threading.RLock()
+            return lock
+
     def _parse_snipe_response(self, data: dict) -> dict:
         if data.get("status") == "error":
             raise SnipeAPIError(str(data.get("messages", data)))
@@ -543,7 +1090,9 @@ class SnipeITClient:
         if self._checkout_status_id is not None:
             return self._checkout_status_id
         name = self._config.checkout_status_name or self._config.default_status_name
-        self._checkout_status_id = self.get_status_id(name)
+        with self._key_lock("status", name):
+            if self._checkout_status_id is None:
+                self._checkout_status_id = self.get_status_id(name)
         return self._checkout_status_id
 
     def checkin_status_id(self) -> int | None:
@@ -553,7 +1102,9 @@ class SnipeITClient:
             self._config.checkin_status_name
             or self._config.default_status_name
         )
-        self._checkin_status_id = self.get_status_id(name)
+        with self._key_lock("status", name):
+            if self._checkin_status_id is None:
+                self._checkin_status_id = self.get_status_id(name)
         return self._checkin_status_id
 
     def _find_in_rows(
@@ -593,51 +1144,93 @@ class SnipeITClient:
             case_insensitive=case_insensitive,
         )
 
+    def _name_index(self, path: str, *fields: str) -> dict[str, int]:
+        """Casefolded ``field`` value -> id; earlier fields take precedence."""
+        rows = list(self._iter_rows(path))
+        index: dict[str, int] = {}
+        for match_field in reversed(fields):
+            for row in reversed(rows):
+                val = row.get(match_field)
+                if val and row.get("id") is not None:
+                    index[str(val).casefold()] = row["id"]
+        return index
+
+    def preload_taxonomy(self) -> None:
+        """Load categories, manufacturers and models once for in-memory lookups."""
+        categories = self._name_index("/categories", "name")
+        manufacturers = self._name_index("/manufacturers", "name")
+        models = self._name_index("/models", "model_number", "name")
+        with self._lock:
+            self._category_index = categories
+            self._manufacturer_index = manufacturers
+            self._model_index = models
+        log.info(
+            "Loaded Snipe-IT taxonomy: %d categories, %d manufacturers, %d model keys",
+            len(categories),
+            len(manufacturers),
+            len(models),
+        )
+
+    def _index_taxonomy(self, index: dict[str, int] | None, name: str, item_id: int) -> None:
+        if index is not None:
+            with self._lock:
+                index[name.casefold()] = item_id
+
     def get_or_create_category(self, name: str, *, dry_run: bool = False) -> int | None:
         if not name:
             return None
-        if name in self._category_cache:
-            return self._category_cache[name]
-        cat_id = self._find_exact("/categories", name, case_insensitive=True)
-        if cat_id:
-            self._category_cache[name] = cat_id
-            return cat_id
-        if dry_run:
+        with self._key_lock("category", name):
+            if name in self._category_cache:
+                return self._category_cache[name]
+            if self._category_index is not None:
+                cat_id = self._category_index.get(name.casefold())
+            else:
+                cat_id = self._find_exact("/categories", name, case_insensitive=True)
+            if cat_id:
+                self._category_cache[name] = cat_id
+                return cat_id
+            if dry_run:
+                return None
+            resp = self._post("/categories", {"name": name, "category_type": "asset"})
+            if resp.get("payload"):
+                cat_id = resp["payload"]["id"]
+                self._category_cache[name] = cat_id
+                self._index_taxonomy(self._category_index, name, cat_id)
+                return cat_id
+            cat_id = self._find_exact("/categories", name, case_insensitive=True)
+            if cat_id:
+                self._category_cache[name] = cat_id
+                return cat_id
+            log.warning("Could not create category '%s': %s", name, resp)
             return None
-        resp = self._post("/categories", {"name": name, "category_type": "asset"})
-        if resp.get("payload"):
-            cat_id = resp["payload"]["id"]
-            self._category_cache[name] = cat_id
-            return cat_id
-        cat_id = self._find_exact("/categories", name, case_insensitive=True)
-        if cat_id:
-            self._category_cache[name] = cat_id
-            return cat_id
-        log.warning("Could not create category '%s': %s", name, resp)
-        return None
 
     def get_or_create_manufacturer(self, name: str, *, dry_run: bool = False) -> int | None:
         if not name:
             return None
-        if name in self._manufacturer_cache:
-            return self._manufacturer_cache[name]
-        man_id = self._find_exact("/manufacturers", name, case_insensitive=True)
-        if man_id:
-            self._manufacturer_cache[name] = man_id
-            return man_id
-        if dry_run:
+        with self._key_lock("manufacturer", name):
+            if name in self._manufacturer_cache:
+                return self._manufacturer_cache[name]
+            if self._manufacturer_index is not None:
+                man_id = self._manufacturer_index.get(name.casefold())
+            else:
+                man_id = self._find_exact("/manufacturers", name, case_insensitive=True)
+            if man_id:
+                self._manufacturer_cache[name] = man_id
+                return man_id
+            if dry_run:
+                return None
+            resp = self._post("/manufacturers", {"name": name})
+            if resp.get("payload"):
+                man_id = resp["payload"]["id"]
+                self._manufacturer_cache[name] = man_id
+                self._index_taxonomy(self._manufacturer_index, name, man_id)
+                return man_id
+            man_id = self._find_exact("/manufacturers", name, case_insensitive=True)
+            if man_id:
+                self._manufacturer_cache[name] = man_id
+                return man_id
+            log.warning("Could not create manufacturer '%s': %s", name, resp)
             return None
-        resp = self._post("/manufacturers", {"name": name})
-        if resp.get("payload"):
-            man_id = resp["payload"]["id"]
-            self._manufacturer_cache[name] = man_id
-            return man_id
-        man_id = self._find_exact("/manufacturers", name, case_insensitive=True)
-        if man_id:
-            self._manufacturer_cache[name] = man_id
-            return man_id
-        log.warning("Could not create manufacturer '%s': %s", name, resp)
-        return None
 
     def get_or_create_model(
         self,
@@ -649,57 +1242,82 @@ class SnipeITClient:
     ) -> int | None:
         if not model_number:
             return None
-        if model_number in self._model_cache:
-            return self._model_cache[model_number]
-        model_cf = model_number.casefold()
-        mod_id = self._find_in_rows(
-            "/models",
-            {"model_number": model_number},
-            match_field="model_number",
-            search=model_number,
-            case_insensitive=True,
-        )
-        if mod_id is None:
-            mod_id = self._find_exact(
-                "/models", model_number, case_insensitive=True
-            )
-        if mod_id is None:
-            for row in self._iter_rows("/models", {"search": model_number}):
-                mn = row.get("model_number") or ""
-                nm = row.get("name") or ""
-                if mn.casefold() == model_cf or nm.casefold() == model_cf:
-                    mod_id = row["id"]
-                    break
-        if mod_id:
-            self._model_cache[model_number] = mod_id
-            return mod_id
-        if dry_run:
+        with self._key_lock("model", model_number):
+            if model_number in self._model_cache:
+                return self._model_cache[model_number]
+            model_cf = model_number.casefold()
+            if self._model_index is not None:
+                mod_id = self._model_index.get(model_cf)
+            else:
+                mod_id = self._find_in_rows(
+                    "/models",
+                    {"model_number": model_number},
+                    match_field="model_number",
+                    search=model_number,
+                    case_insensitive=True,
+                )
+                if mod_id is None:
+                    mod_id = self._find_exact(
+                        "/models", model_number, case_insensitive=True
+                    )
+                if mod_id is None:
+                    for row in self._iter_rows("/models", {"search": model_number}):
+                        mn = row.get("model_number") or ""
+                        nm = row.get("name") or ""
+                        if mn.casefold() == model_cf or nm.casefold() == model_cf:
+                            mod_id = row["id"]
+                            break
+            if mod_id:
+                self._model_cache[model_number] = mod_id
+                return mod_id
+            if dry_run:
+                return None
+            resp = self._post("/models", {
+                "name": model_number,
+                "model_number": model_number,
+                "manufacturer_id": manufacturer_id,
+                "category_id": category_id,
+            })
+            if resp.get("payload"):
+                mod_id = resp["payload"]["id"]
+                self._model_cache[model_number] = mod_id
+                self._index_taxonomy(self._model_index, model_number, mod_id)
+                return mod_id
+            log.warning("Could not create model '%s': %s", model_number, resp)
             return None
-        resp = self._post("/models", {
-            "name": model_number,
-            "model_number": model_number,
-            "manufacturer_id": manufacturer_id,
-            "category_id": category_id,
-        })
-        if resp.get("payload"):
-            mod_id = resp["payload"]["id"]
-            self._model_cache[model_number] = mod_id
-            return mod_id
-        log.warning("Could not create model '%s': %s", model_number, resp)
-        return None
 
-    def _lookup_status_id(self, name: str) -> int | None:
-        if name in self._status_cache:
-            return self._status_cache[name]
+    def _load_status_labels(self) -> None:
+        """Fetch every status label in one pass and index it by name."""
+        labels: dict[str, int] = {}
         for row in self._iter_rows("/statuslabels"):
-            if row.get("name") == name:
-                self._status_cache[name] = row["id"]
-                return row["id"]
-        return None
+            name = row.get("name")
+            if name and row.get("id") is not None:
+                labels.setdefault(name, row["id"])
+        with self._lock:
+            self._status_cache.update(labels)
+            self._status_missing.clear()
+            self._status_labels_loaded = True
+        log.debug("Loaded %d Snipe-IT status label(s)", len(labels))
+
+    def _lookup_status_id(self, name: str, *, refresh: bool = False) -> int | None:
+        if not refresh:
+            if name in self._status_cache:
+                return self._status_cache[name]
+            if name in self._status_missing:
+                return None
+        with self._key_lock("status", ""):
+            if refresh or not self._status_labels_loaded:
+                self._load_status_labels()
+        status_id = self._status_cache.get(name)
+        if status_id is None:
+            with self._lock:
+                self._status_missing.add(name)
+        return status_id
 
     def get_status_id(self, name: str) -> int | None:
+        already_missing = name in self._status_missing
         status_id = self._lookup_status_id(name)
-        if status_id is None:
+        if status_id is None and not already_missing:
             log.error("Status label '%s' not found", name)
         return status_id
 
@@ -730,74 +1348,155 @@ class SnipeITClient:
             return None
         if resp.get("payload"):
             status_id = resp["payload"]["id"]
-            self._status_cache[name] = status_id
+            with self._lock:
+                self._status_cache[name] = status_id
+                self._status_missing.discard(name)
             log.info("Created status label '%s' (id=%s, type=%s)", name, status_id, status_type)
             return status_id
-        status_id = self._lookup_status_id(name)
+        status_id = self._lookup_status_id(name, refresh=True)
         if status_id is not None:
             return status_id
         log.warning("Could not create status label '%s': %s", name, resp)
         return None
 
+    def preload_user_index(self) -> int:
+        """Page ``/users`` once into casefolded email and username indexes."""
+        by_email: dict[str, int] = {}
+        by_username: dict[str, int] = {}
+        count = 0
+        for row in self._iter_rows("/users"):
+            user_id = row.get("id")
+            if user_id is None:
+                continue
+            count += 1
+            email = row.get("email")
+            if email:
+                by_email.setdefault(email.casefold(), user_id)
+            username = row.get("username")
+            if username:
+                by_username.setdefault(username.casefold(), user_id)
+        with self._lock:
+            self._user_email_index = by_email
+            self._user_username_index = by_username
+        log.info("Loaded %d Snipe-IT user(s) into email/username index", count)
+        return count
+
+    def _indexed_user_id(self, cache_key: str) -> int | None:
+        if self._user_email_index is not None and "@" in cache_key:
+            user_id = self._user_email_index.get(cache_key)
+            if user_id is not None:
+                return user_id
+        if self._user_username_index is not None:
+            return self._user_username_index.get(cache_key)
+        return None
+
     def get_user_id(self, upn: str | None) -> int | None:
         if not upn:
             return None
         cache_key = upn.casefold()
-        if cache_key in self._user_cache:
-            return self._user_cache[cache_key]
-
-        user_id: int | None = None
-        if "@" in upn:
-            for row in self._iter_rows("/users", {"email": upn}):
-                em = row.get("email")
-                if em and em.casefold() == cache_key:
-                    user_id = row["id"]
-                    break
-
-        if user_id is None:
-            for row in self._iter_rows("/users", {"username": upn}):
-                un = row.get("username")
-                if un and un.casefold() == cache_key:
-                    user_id = row["id"]
-                    break
-
-        if user_id is None:
-            log.warning(
-                "No Snipe-IT user found with matching email or username for %s",
-                upn,
-            )
-        self._user_cache[cache_key] = user_id
-        return user_id
+        with self._key_lock("user", cache_key):
+            if cache_key in self._user_cache:
+                return self._user_cache[cache_key]
+
+            user_id = self._indexed_user_id(cache_key)
+            if user_id is None and "@" in upn:
+                for row in self._iter_rows("/users", {"email": upn}):
+                    em = row.get("email")
+                    if em and em.casefold() == cache_key:
+                        user_id = row["id"]
+                        break
+
+            if user_id is None:
+                for row in self._iter_rows("/users", {"username": upn}):
+                    un = row.get("username")
+                    if un and un.casefold() == cache_key:
+                        user_id = row["id"]
+                        break
+
+            if user_id is None:
+                log.warning(
+                    "No Snipe-IT user found with matching email or username for %s",
+                    upn,
+                )
+            self._user_cache[cache_key] = user_id
+            return user_id
+
+    def preload_location_index(self) -> int:
+        """Page ``/locations`` once (id order) into a name prefix index."""
+        index = LocationPrefixIndex()
+        for row in self._iter_rows("/locations", {"sort": "id", "order": "asc"}):
+            name = row.get("name")
+            if name and row.get("id") is not None:
+                index.add(name, row["id"])
+        with self._lock:
+            self._location_index = index
+        log.info("Loaded %d Snipe-IT location(s) into prefix index", len(index))
+        return len(index)
 
     def get_location_id(self, upn: str | None, prefix_len: int = 3) -> int | None:
         prefix = _upn_location_prefix(upn, prefix_len)
         if not prefix:
             return None
         cache_key = prefix.casefold()
-        if cache_key in self._location_cache:
-            return self._location_cache[cache_key]
-
-        location_id: int | None = None
-        for row in self._iter_rows("/locations", {"search": prefix}):
-            name = row.get("name") or ""
-            if name.casefold().startswith(cache_key):
-                location_id = row["id"]
-                break
-
-        if location_id is None:
-            log.warning(
-                "No Snipe-IT location found with name prefix '%s' for %s",
-                prefix,
-                upn,
-            )
-        self._location_cache[cache_key] = location_id
-        return location_id
+        with self._key_lock("location", cache_key):
+            if cache_key in self._location_cache:
+                return self._location_cache[cache_key]
+
+            location_id = self._location_map.get(cache_key)
+            if location_id is None and self._location_index is not None:
+                location_id = self._location_index.lookup(cache_key)
+            elif location_id is None:
+                for row in self._iter_rows("/locations", {"search": prefix}):
+                    name = row.get("name") or ""
+                    if name.casefold().startswith(cache_key):
+                        location_id = row["id"]
+                        break
+
+            if location_id is None:
+                log.warning(
+                    "No Snipe-IT location found with name prefix '%s' for %s",
+                    prefix,
+                    upn,
+                )
+            self._location_cache[cache_key] = location_id
+            return location_id
+
+    def preload_asset_index(self) -> int:
+        """Page ``/hardware`` once into a case-normalised serial index.
+
+        Active rows win over archived rows, which win over soft-deleted rows.
+        ``find_asset_by_serial`` answers from the index once it is loaded.
+        """
+        index: dict[str, dict] = {}
+        for params in ({"status": "Deleted"}, {"status": "Archived"}, None):
+            for row in self._iter_rows("/hardware", params):
+                key = _asset_serial_key(row)
+                if key:
+                    index[key] = row
+        with self._lock:
+            self._asset_index = index
+        log.info("Loaded %d Snipe-IT asset(s) into serial index", len(index))
+        return len(index)
+
+    def _remember_asset(self, asset: dict) -> None:
+        """Keep the serial index current after creates and restores."""
+        key = _asset_serial_key(asset)
+        if not key:
+            return
+        with self._lock:
+            if self._asset_index is not None:
+                self._asset_index[key] = asset
 
     def find_asset_by_serial(
         self, serial: str, *, include_deleted: bool = False
     ) -> dict | None:
         if not serial:
             return None
+        if self._asset_index is not None:
+            asset = self._asset_index.get(_serial_key(serial))
+            if asset and _asset_is_deleted(asset) and not include_deleted:
+                return None
+            return asset
         path = f"/hardware/byserial/{quote(serial, safe='')}"
         params = {"deleted": "true"} if include_deleted else None
         try:
@@ -815,14 +1514,46 @@ class SnipeITClient:
             return None
         return self.find_asset_by_serial(serial, include_deleted=True)
 
+    def find_asset_by_id(
+        self, asset_id: int, serial: str, *, include_deleted: bool = False
+    ) -> dict | None:
+        """Fetch ``/hardware/{id}``; None if it is gone or no longer carries ``serial``."""
+        try:
+            asset = self._get(f"/hardware/{int(asset_id)}")
+        except requests.exceptions.HTTPError as exc:
+            if exc.response is not None and exc.response.status_code == 404:
+                return None
+            raise
+        except SnipeAPIError as exc:
+            if _snipe_asset_not_found(exc):
+                return None
+            raise
+        if _asset_serial_key(asset) != _serial_key(serial):
+            log.debug(
+                "Asset %s no longer has serial %s; looking it up by serial", asset_id, serial
+            )
+            return None
+        if _asset_is_deleted(asset) and not include_deleted:
+            return None
+        return asset
+
     def ensure_asset_for_sync(
-        self, serial: str, *, config: SyncConfig
+        self, serial: str, *, config: SyncConfig, asset_id: int | None = None
     ) -> dict | None:
-        """Find asset by serial; optionally restore soft-deleted rows before sync."""
+        """Find asset by serial; optionally restore soft-deleted rows before sync.
+
+        ``asset_id`` (remembered from the last run) is tried first via
+        ``/hardware/{id}``; the serial lookup is the fallback. A loaded asset
+        index always wins.
+        """
         include_deleted = (
             config.include_deleted_assets or config.restore_deleted_assets
         )
-        asset = self.find_asset_by_serial(serial, include_deleted=include_deleted)
+        asset = None
+        if asset_id is not None and self._asset_index is None:
+            asset = self.find_asset_by_id(asset_id, serial, include_deleted=include_deleted)
+        if not asset:
+            asset = self.find_asset_by_serial(serial, include_deleted=include_deleted)
         if not asset:
             return None
         if config.restore_deleted_assets and _asset_is_deleted(asset):
@@ -830,6 +1561,10 @@ class SnipeITClient:
             if asset_id is None:
                 return asset
             if self.restore_asset(int(asset_id)):
+                if self._asset_index is not None:
+                    restored = {**asset, "deleted_at": None, "deleted": False}
+                    self._remember_asset(restored)
+                    return restored
                 restored = self.find_asset_by_serial(serial, include_deleted=False)
                 return restored or asset
         return asset
@@ -876,6 +1611,7 @@ class SnipeITClient:
             log.error("Failed to create asset: %s", exc)
             return None
         if resp.get("status") == "success" and resp.get("payload"):
+            self._remember_asset(resp["payload"])
             return resp["payload"]
         log.error("Failed to create asset: %s", resp)
         return None
@@ -961,6 +1697,15 @@ def _snipe_asset_not_found(exc: SnipeAPIError) -> bool:
     return "does not exist" in msg or "asset not found" in msg
 
 
+def _serial_key(serial: Any) -> str:
+    return str(serial or "").strip().casefold()
+
+
+def _asset_serial_key(asset: dict) -> str:
+    """``_serial_key`` of a Snipe-IT row, whose serial comes back HTML-escaped."""
+    return _serial_key(html.unescape(str(asset.get("serial") or "")))
+
+
 def _asset_tag_for_create(device_name: str, serial: str) -> str | None:
     for candidate in (device_name, serial):
         tag = str(candidate or "").strip()
@@ -1051,6 +1796,22 @@ def _normalize_checkout_mode(mode: str) -> str:
     return "user"
 
 
+def _normalize_notes_policy(policy: str) -> str:
+    normalized = policy.strip().casefold()
+    if normalized in NOTES_CHANGE_POLICIES:
+        return normalized
+    log.warning("Invalid SNIPEIT_NOTES_CHANGE_POLICY=%r; using 'stable'", policy)
+    return "stable"
+
+
+def _normalize_state_backend(backend: str) -> str:
+    normalized = backend.strip().casefold() or "json"
+    if normalized in SYNC_STATE_BACKENDS:
+        return normalized
+    log.warning("Invalid SYNC_STATE_BACKEND=%r; using 'json'", backend)
+    return "json"
+
+
 def _location_prefix_length() -> int:
     raw = os.getenv("SNIPEIT_LOCATION_PREFIX_LENGTH", "3")
     try:
@@ -1080,9 +1841,15 @@ def _parse_graph_datetime(value: str | None) -> datetime | None:
         return None
 
 
+def _graph_datetime(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
 def _device_user_upn(
     device: dict,
-    primary_upns: dict[str, str],
+    primary_upns: dict[str, str | None],
     config: SyncConfig,
 ) -> str | None:
     device_id = device.get("id")
@@ -1127,13 +1894,25 @@ def _resolve_status_id(
     return default_status_id
 
 
+def _device_field(device: dict, key: str) -> Any:
+    """Read a device property; dotted keys walk nested objects (``a.b``)."""
+    if key in device or "." not in key:
+        return device.get(key)
+    value: Any = device
+    for part in key.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
 def _custom_field_payload(device: dict, config: SyncConfig) -> dict[str, Any]:
     payload: dict[str, Any] = {}
     for intune_key, snipe_col in config.custom_fields.items():
         if intune_key.startswith("_autopilot_"):
             value = device.get(intune_key)
         else:
-            value = device.get(intune_key)
+            value = _device_field(device, intune_key)
         if value is not None and value != "":
             payload[snipe_col] = value
     return payload
@@ -1222,70 +2001,775 @@ def _build_asset_payload(
     return payload
 
 
-def load_sync_state(path: str | None) -> dict[str, Any]:
-    if not path or not os.path.isfile(path):
-        return {}
-    try:
-        with open(path, encoding="utf-8") as fh:
-            data = json.load(fh)
-        return data if isinstance(data, dict) else {}
-    except (OSError, json.JSONDecodeError) as exc:
-        log.warning("Could not read sync state from %s: %s", path, exc)
-        return {}
+def _stable_notes(notes: str) -> str:
+    return " | ".join(
+        part for part in notes.split(" | ") if not part.startswith(VOLATILE_NOTE_PREFIXES)
+    )
 
 
-def save_sync_state(path: str | None, state: dict[str, Any]) -> None:
-    if not path:
-        return
-    try:
-        with open(path, "w", encoding="utf-8") as fh:
-            json.dump(state, fh, indent=2, sort_keys=True)
-            fh.write("\n")
-    except OSError as exc:
-        log.warning("Could not write sync state to %s: %s", path, exc)
+def _comparable(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    # Snipe-IT returns text fields HTML-escaped (``&amp;``, ``&#039;``).
+    return html.unescape(str(value)).strip()
+
+
+def _existing_custom_values(existing: dict) -> dict[str, Any]:
+    """Map custom field DB column -> current value from a Snipe asset row."""
+    values: dict[str, Any] = {}
+    custom = existing.get("custom_fields")
+    if not isinstance(custom, dict):
+        return values
+    for field_info in custom.values():
+        if isinstance(field_info, dict) and field_info.get("field"):
+            values[field_info["field"]] = field_info.get("value")
+    return values
+
+
+def _existing_asset_value(existing: dict, key: str) -> Any:
+    relation = ASSET_RELATION_FIELDS.get(key)
+    if relation is None:
+        return existing.get(key)
+    nested = existing.get(relation)
+    if isinstance(nested, dict):
+        return nested.get("id")
+    return existing.get(key)
+
+
+def _asset_payload_changes(
+    payload: dict[str, Any], existing: dict, config: SyncConfig
+) -> list[str]:
+    """Return payload keys whose value differs from the existing Snipe asset."""
+    custom_values = _existing_custom_values(existing)
+    changed: list[str] = []
+    for key, value in payload.items():
+        if key == "notes":
+            if config.notes_change_policy == "ignore":
+                continue
+            wanted = str(value or "")
+            current = html.unescape(str(existing.get("notes") or ""))
+            if config.notes_change_policy == "stable":
+                wanted, current = _stable_notes(wanted), _stable_notes(current)
+            if wanted.strip() != current.strip():
+                changed.append(key)
+            continue
+        if key in custom_values:
+            current = custom_values[key]
+        else:
+            current = _existing_asset_value(existing, key)
+        if _comparable(value) != _comparable(current):
+            changed.append(key)
+    return changed
+
+
+def _state_entries(state: dict[str, Any]) -> Iterator[tuple[str, dict]]:
+    """Yield (serial, entry) pairs, skipping the metadata key."""
+    for serial, entry in state.items():
+        if serial != SYNC_STATE_META_KEY and isinstance(entry, dict):
+            yield serial, entry
+
+
+def _state_meta(state: dict[str, Any]) -> dict[str, Any]:
+    meta = state.get(SYNC_STATE_META_KEY)
+    return meta if isinstance(meta, dict) else {}
 
 
-def fetch_group_device_ids(graph: GraphClient, group_ids: list[str]) -> set[str] | None:
+def _sync_scope(platform: str, group_ids: list[str] | None) -> str:
+    """Key of a run's scope metadata (watermark, checkpoint, group members).
+
+    Runs filtered by groups get their own scope per group set, so a watermark
+    from another group set (or from an unfiltered run) is never reused.
+    """
     if not group_ids:
-        return None
-    device_ids: set[str] = set()
-    for group_id in group_ids:
-        if not group_id:
-            continue
-        try:
-            url = (
-                f"https://graph.microsoft.com/v1.0/groups/{group_id}"
-                "/members/microsoft.graph.device"
-            )
-            devices = graph.get_paginated(url)
-            for dev in devices:
-                dev_id = dev.get("id")
-                if dev_id:
-                    device_ids.add(dev_id)
-        except requests.exceptions.HTTPError as e:
-            if e.response is not None and e.response.status_code == 404:
-                log.warning("Group %s not found or not accessible", group_id)
-            elif e.response is not None and e.response.status_code == 403:
-                raise RuntimeError(
-                    f"403 Forbidden accessing group {group_id}: grant an application "
-                    "permission that can list group members, e.g. GroupMember.Read.All "
-                    "or Group.Read.All (see Microsoft Graph: List group members)."
-                ) from e
-            else:
-                log.error("Failed to fetch devices from group %s: %s", group_id, e)
-    log.info("Found %d Azure AD devices from %d group(s)", len(device_ids), len(group_ids))
-    return device_ids
+        return platform
+    digest = hashlib.sha256(",".join(sorted(set(group_ids))).encode()).hexdigest()
+    return f"{platform}:groups:{digest[:12]}"
 
 
-def _managed_devices_url(platform: str) -> str:
-    query: dict[str, str] = {"$select": MANAGED_DEVICE_SELECT}
-    odata_filter = PLATFORM_ODATA_FILTERS.get(platform)
-    if odata_filter:
-        query["$filter"] = odata_filter
-    return (
-        "https://graph.microsoft.com/v1.0/deviceManagement/managedDevices?"
-        + urlencode(query, safe=",'")
-    )
+def _scope_meta(state: dict[str, Any], scope_key: str) -> dict[str, Any]:
+    scopes = _state_meta(state).get("scopes")
+    if not isinstance(scopes, dict):
+        return {}
+    scope = scopes.get(scope_key)
+    return scope if isinstance(scope, dict) else {}
+
+
+def _incremental_since(
+    state: dict[str, Any],
+    scope_key: str,
+    config: SyncConfig,
+    now: datetime,
+) -> datetime | None:
+    """Lower bound for ``lastSyncDateTime`` this run, or None for a full sweep."""
+    if not config.incremental_sync or not config.sync_state_file:
+        return None
+    scope = _scope_meta(state, scope_key)
+    watermark = _parse_graph_datetime(scope.get("watermark"))
+    last_full = _parse_graph_datetime(scope.get("last_full_sync"))
+    if watermark is None or last_full is None:
+        return None
+    if last_full.tzinfo is None:
+        last_full = last_full.replace(tzinfo=timezone.utc)
+    if (
+        config.full_sync_interval_hours
+        and now - last_full >= timedelta(hours=config.full_sync_interval_hours)
+    ):
+        return None
+    return watermark - timedelta(minutes=config.incremental_skew_minutes)
+
+
+def _reusable_state_entry(dev: dict, previous_state: dict[str, Any]) -> dict | None:
+    """Previous entry for ``dev`` if it has not checked in with Intune since."""
+    entry = previous_state.get(dev.get("serialNumber") or "")
+    if (
+        isinstance(entry, dict)
+        and entry.get("intune_id") == dev.get("id")
+        and entry.get("last_sync") == dev.get("lastSyncDateTime")
+    ):
+        return entry
+    return None
+
+
+def _cached_primary_upns(
+    devices: list[dict], previous_state: dict[str, Any]
+) -> tuple[dict[str, str | None], list[str]]:
+    """Split devices into cached primary UPNs and ids that need a Graph lookup.
+
+    A cached value is reused while the device's ``lastSyncDateTime`` matches
+    the one recorded with it, i.e. it has not checked in with Intune since.
+    """
+    cached: dict[str, str | None] = {}
+    missing: list[str] = []
+    for dev in devices:
+        device_id = dev.get("id")
+        if not device_id:
+            continue
+        entry = _reusable_state_entry(dev, previous_state)
+        if entry is not None and "primary_upn" in entry:
+            cached[device_id] = entry["primary_upn"]
+        else:
+            missing.append(device_id)
+    return cached, missing
+
+
+def _cached_enrichment(
+    devices: list[dict], previous_state: dict[str, Any], fields: list[str]
+) -> tuple[dict[str, dict], list[str]]:
+    """Split devices into cached detail properties and ids that need a Graph read.
+
+    Same reuse rule as ``_cached_primary_upns``; the cached entry must also
+    cover every requested field.
+    """
+    cached: dict[str, dict] = {}
+    missing: list[str] = []
+    for dev in devices:
+        device_id = dev.get("id")
+        if not device_id:
+            continue
+        entry = _reusable_state_entry(dev, previous_state)
+        enrichment = entry.get("enrichment") if entry is not None else None
+        if isinstance(enrichment, dict) and all(f in enrichment for f in fields):
+            cached[device_id] = {f: enrichment[f] for f in fields}
+        else:
+            missing.append(device_id)
+    return cached, missing
+
+
+def _device_last_sync(device: dict) -> datetime | None:
+    last_sync = _parse_graph_datetime(device.get("lastSyncDateTime"))
+    if last_sync is not None and last_sync.tzinfo is None:
+        last_sync = last_sync.replace(tzinfo=timezone.utc)
+    return last_sync
+
+
+def _updated_state_meta(
+    state: dict[str, Any],
+    scope_key: str,
+    devices: list[dict],
+    *,
+    full_sweep: bool,
+    now: datetime,
+    group_members: list[str] | None = None,
+    failed_devices: list[dict] | None = None,
+) -> dict[str, Any]:
+    """Advance the scope's watermark (and full-sweep time) after a run.
+
+    The watermark never passes a device in ``failed_devices``, so the next
+    incremental run lists it again.
+    """
+    meta = dict(_state_meta(state))
+    scopes = dict(meta.get("scopes") or {})
+    scope = dict(scopes.get(scope_key) or {})
+    watermark = _parse_graph_datetime(scope.get("watermark"))
+    if watermark is not None and watermark.tzinfo is None:
+        watermark = watermark.replace(tzinfo=timezone.utc)
+    for dev in devices:
+        last_sync = _device_last_sync(dev)
+        if last_sync is not None and (watermark is None or last_sync > watermark):
+            watermark = last_sync
+    for dev in failed_devices or []:
+        last_sync = _device_last_sync(dev)
+        if last_sync is not None and watermark is not None and last_sync < watermark:
+            watermark = last_sync
+    if watermark is not None:
+        scope["watermark"] = _graph_datetime(watermark)
+    if full_sweep:
+        scope["last_full_sync"] = _graph_datetime(now)
+    if group_members is not None:
+        scope["group_members"] = group_members
+    scope.pop("checkpoint", None)
+    scopes[scope_key] = scope
+    meta["scopes"] = scopes
+    return meta
+
+
+def _resume_checkpoint(state: dict[str, Any], scope_key: str) -> dict[str, str]:
+    """Serial -> outcome of devices completed by an interrupted run of ``scope_key``.
+
+    Failed outcomes are left out so a resumed run retries those devices.
+    """
+    checkpoint = _scope_meta(state, scope_key).get("checkpoint")
+    completed = checkpoint.get("completed") if isinstance(checkpoint, dict) else None
+    if not isinstance(completed, dict):
+        return {}
+    return {
+        serial: outcome
+        for serial, outcome in completed.items()
+        if outcome not in FAILED_OUTCOMES
+    }
+
+
+def _checkpoint_state(
+    previous_state: dict[str, Any],
+    sync_state: dict[str, Any],
+    scope_key: str,
+    completed: dict[str, str],
+    *,
+    started: datetime,
+) -> dict[str, Any]:
+    """Previous state overlaid with this run's entries plus a resumable checkpoint.
+
+    Watermarks are left alone; only a finished run advances them.
+    """
+    state: dict[str, Any] = dict(_state_entries(previous_state))
+    state.update(sync_state)
+    meta = dict(_state_meta(previous_state))
+    scopes = dict(meta.get("scopes") or {})
+    scope = dict(scopes.get(scope_key) or {})
+    scope["checkpoint"] = {
+        "started_at": _graph_datetime(started),
+        "completed": dict(completed),
+    }
+    scopes[scope_key] = scope
+    meta["scopes"] = scopes
+    state[SYNC_STATE_META_KEY] = meta
+    return state
+
+
+def load_sync_state(path: str | None) -> dict[str, Any]:
+    if not path or not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        return data if isinstance(data, dict) else {}
+    except (OSError, json.JSONDecodeError) as exc:
+        log.warning("Could not read sync state from %s: %s", path, exc)
+        return {}
+
+
+def save_sync_state(path: str | None, state: dict[str, Any]) -> None:
+    """Write the JSON state via a temp file + rename so a killed run cannot truncate it."""
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(state, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        log.warning("Could not write sync state to %s: %s", path, exc)
+
+
+def _merge_sync_state(
+    on_disk: dict[str, Any],
+    run_state: dict[str, Any],
+    platform: str,
+    scope_key: str | None = None,
+) -> dict[str, Any]:
+    """Replace the ``platform`` partition of the stored state with this run's.
+
+    Entries of other platforms, other scopes' metadata (``scope_key``
+    defaults to ``platform``) and group delta links are kept as stored, so
+    per-platform jobs can share one state file.
+    """
+    scope_key = scope_key or platform
+    merged: dict[str, Any] = {
+        serial: entry
+        for serial, entry in _state_entries(on_disk)
+        if not _state_entry_in_scope(entry, platform)
+    }
+    for serial, entry in _state_entries(run_state):
+        if _state_entry_in_scope(entry, platform):
+            merged[serial] = entry
+
+    meta = dict(_state_meta(on_disk))
+    for key, value in _state_meta(run_state).items():
+        if key == "scopes" and isinstance(value, dict):
+            scopes = dict(meta.get("scopes") or {})
+            if scope_key in value:
+                scopes[scope_key] = value[scope_key]
+            else:
+                scopes.pop(scope_key, None)
+            meta["scopes"] = scopes
+        elif key == "group_delta" and isinstance(value, dict):
+            meta["group_delta"] = {**(meta.get("group_delta") or {}), **value}
+        else:
+            meta[key] = value
+    if meta:
+        merged[SYNC_STATE_META_KEY] = meta
+    return merged
+
+
+@contextmanager
+def _state_file_lock(path: str) -> Iterator[None]:
+    """Exclusive advisory lock on ``<path>.lock``.
+
+    A no-op where fcntl is unavailable or the lock file cannot be opened; the
+    write that follows then reports its own error.
+    """
+    if fcntl is None:
+        yield
+        return
+    try:
+        fh = open(f"{path}.lock", "a", encoding="utf-8")
+    except OSError as exc:
+        log.warning("Could not lock sync state %s: %s", path, exc)
+        yield
+        return
+    with fh:
+        try:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        except OSError as exc:
+            log.warning("Could not lock sync state %s: %s", path, exc)
+            yield
+            return
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+class JsonSyncStateStore:
+    """Sync state as one JSON document, rewritten at the end of each run."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self) -> dict[str, Any]:
+        return load_sync_state(self.path)
+
+    def record(self, serial: str, entry: dict[str, Any]) -> None:
+        """Per-device writes are not supported; everything is written by ``save``."""
+
+    def save(
+        self, state: dict[str, Any], *, platform: str = "all", scope_key: str | None = None
+    ) -> None:
+        """Merge ``state`` into the file under a lock, rewriting only ``platform``."""
+        with _state_file_lock(self.path):
+            on_disk = load_sync_state(self.path)
+            save_sync_state(
+                self.path, _merge_sync_state(on_disk, state, platform, scope_key)
+            )
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteSyncStateStore:
+    """Sync state in SQLite: one row per serial, upserted as devices complete.
+
+    Runs in WAL mode; ``save`` only rewrites rows whose entry changed and
+    deletes serials that left the state. A JSON state file found at ``path``
+    is moved to ``<path>.json.bak`` and imported.
+    """
+
+    _UPSERT = (
+        "INSERT INTO devices (serial, platform, outcome, data) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(serial) DO UPDATE SET platform = excluded.platform, "
+        "outcome = excluded.outcome, data = excluded.data"
+    )
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, Any, Any, str]] = []
+        self._stored: dict[str, str] = {}
+        legacy = self._take_legacy_json(path)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS devices ("
+                "serial TEXT PRIMARY KEY, platform TEXT, outcome TEXT, data TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS devices_platform ON devices (platform)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS devices_outcome ON devices (outcome)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+        if legacy is not None:
+            self.save(legacy, platform="all")
+            log.info(
+                "Migrated %d sync state entries from JSON into %s",
+                sum(1 for _ in _state_entries(legacy)),
+                path,
+            )
+
+    @staticmethod
+    def _take_legacy_json(path: str) -> dict[str, Any] | None:
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as fh:
+            header = fh.read(len(SQLITE_HEADER))
+        if header == SQLITE_HEADER or not header:
+            return None
+        state = load_sync_state(path)
+        backup = f"{path}.json.bak"
+        os.replace(path, backup)
+        log.info("Found JSON sync state at %s; keeping a copy at %s", path, backup)
+        return state
+
+    @staticmethod
+    def _row(serial: str, entry: dict[str, Any]) -> tuple[str, Any, Any, str]:
+        return (
+            serial,
+            entry.get("platform"),
+            entry.get("outcome"),
+            json.dumps(entry, sort_keys=True),
+        )
+
+    def load(self) -> dict[str, Any]:
+        state: dict[str, Any] = {}
+        with self._lock:
+            for serial, data in self._conn.execute("SELECT serial, data FROM devices"):
+                self._stored[serial] = data
+                state[serial] = json.loads(data)
+            meta = {
+                key: json.loads(data)
+                for key, data in self._conn.execute("SELECT key, data FROM meta")
+            }
+        if meta:
+            state[SYNC_STATE_META_KEY] = meta
+        return state
+
+    def record(self, serial: str, entry: dict[str, Any]) -> None:
+        with self._lock:
+            self._pending.append(self._row(serial, entry))
+            if len(self._pending) >= SQLITE_UPSERT_BATCH:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        rows = [row for row in self._pending if self._stored.get(row[0]) != row[3]]
+        self._pending = []
+        if not rows:
+            return
+        with self._conn:
+            self._conn.executemany(self._UPSERT, rows)
+        self._stored.update((row[0], row[3]) for row in rows)
+
+    def save(
+        self, state: dict[str, Any], *, platform: str = "all", scope_key: str | None = None
+    ) -> None:
+        """Rewrite the ``platform`` partition in one transaction; other rows stay."""
+        with self._lock:
+            self._pending = []
+            rows = [
+                self._row(serial, entry)
+                for serial, entry in _state_entries(state)
+                if _state_entry_in_scope(entry, platform)
+            ]
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                removed = [
+                    (serial,)
+                    for serial, row_platform in self._conn.execute(
+                        "SELECT serial, platform FROM devices"
+                    )
+                    if serial not in state
+                    and _state_entry_in_scope({"platform": row_platform}, platform)
+                ]
+                rows = [row for row in rows if self._stored.get(row[0]) != row[3]]
+                on_disk_meta = {
+                    key: json.loads(data)
+                    for key, data in self._conn.execute("SELECT key, data FROM meta")
+                }
+                meta = _state_meta(
+                    _merge_sync_state(
+                        {SYNC_STATE_META_KEY: on_disk_meta}, state, platform, scope_key
+                    )
+                )
+                self._conn.executemany(self._UPSERT, rows)
+                self._conn.executemany("DELETE FROM devices WHERE serial = ?", removed)
+                self._conn.execute("DELETE FROM meta")
+                self._conn.executemany(
+                    "INSERT INTO meta (key, data) VALUES (?, ?)",
+                    [(key, json.dumps(value, sort_keys=True)) for key, value in meta.items()],
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            for (serial,) in removed:
+                self._stored.pop(serial, None)
+            self._stored.update((row[0], row[3]) for row in rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_sync_state_store(
+    config: SyncConfig,
+) -> JsonSyncStateStore | SqliteSyncStateStore | None:
+    if not config.sync_state_file:
+        return None
+    if config.sync_state_backend == "sqlite":
+        return SqliteSyncStateStore(config.sync_state_file)
+    return JsonSyncStateStore(config.sync_state_file)
+
+
+def _group_members_path(group_id: str, *, transitive: bool = False) -> str:
+    relation = "transitiveMembers" if transitive else "members"
+    return f"/groups/{group_id}/{relation}/microsoft.graph.device?$select=id"
+
+
+def _group_fetch_failed(group_id: str, status: int | None, error: object) -> None:
+    if status == 404:
+        log.warning("Group %s not found or not accessible", group_id)
+    elif status == 403:
+        raise RuntimeError(
+            f"403 Forbidden accessing group {group_id}: grant an application "
+            "permission that can list group members, e.g. GroupMember.Read.All "
+            "or Group.Read.All (see Microsoft Graph: List group members)."
+        )
+    else:
+        log.error("Failed to fetch devices from group %s: %s", group_id, error)
+
+
+def _group_delta_url(group_id: str) -> str:
+    return (
+        "https://graph.microsoft.com/v1.0/groups/delta?"
+        + urlencode({"$filter": f"id eq '{group_id}'", "$select": "members"}, safe="'")
+    )
+
+
+def _group_members_delta(
+    graph: GraphClient, group_id: str, cached: dict | None
+) -> dict[str, Any]:
+    """Apply ``members@delta`` changes to a cached device membership set.
+
+    Starts a full enumeration when there is no stored ``deltaLink`` or Graph
+    rejects it as expired.
+    """
+    delta_link = (cached or {}).get("delta_link")
+    members: set[str] = set((cached or {}).get("members") or []) if delta_link else set()
+    items: list[dict] | None = None
+    if delta_link:
+        try:
+            items, delta_link = graph.get_delta(delta_link)
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status not in GRAPH_DELTA_EXPIRED_STATUSES:
+                raise
+            log.info("Delta token for group %s expired; re-enumerating members", group_id)
+            members = set()
+    if items is None:
+        items, delta_link = graph.get_delta(_group_delta_url(group_id))
+    for group in items:
+        if group.get("id") != group_id:
+            continue
+        for member in group.get("members@delta") or []:
+            member_id = member.get("id")
+            if not member_id:
+                continue
+            if "@removed" in member:
+                members.discard(member_id)
+            elif member.get("@odata.type") == "#microsoft.graph.device":
+                members.add(member_id)
+    return {"delta_link": delta_link, "members": sorted(members)}
+
+
+def _fetch_group_device_ids_delta(
+    graph: GraphClient,
+    group_ids: list[str],
+    delta_state: dict[str, Any],
+    *,
+    max_workers: int = 1,
+) -> set[str]:
+    def _one(group_id: str) -> tuple[str, dict | None]:
+        try:
+            return group_id, _group_members_delta(graph, group_id, delta_state.get(group_id))
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            _group_fetch_failed(group_id, status, e)
+            return group_id, None
+
+    device_ids: set[str] = set()
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(group_ids))),
+        thread_name_prefix="graph-groups",
+    ) as pool:
+        for group_id, result in pool.map(_one, group_ids):
+            if result is None:
+                delta_state.pop(group_id, None)
+                continue
+            delta_state[group_id] = result
+            device_ids.update(result["members"])
+    return device_ids
+
+
+def fetch_group_device_ids(
+    graph: GraphClient,
+    group_ids: list[str],
+    *,
+    transitive: bool = False,
+    max_workers: int = 1,
+    delta_state: dict[str, Any] | None = None,
+) -> set[str] | None:
+    """Collect Azure AD device ids from the given groups.
+
+    The first page of every group is fetched through one Graph ``$batch``;
+    groups with further pages are then followed in parallel. When
+    ``delta_state`` is given, membership comes from the groups delta query
+    instead and ``delta_state`` is updated in place (per group
+    ``deltaLink`` plus the cached device ids).
+    """
+    if not group_ids:
+        return None
+    unique_ids = [gid for gid in dict.fromkeys(group_ids) if gid]
+    if delta_state is not None:
+        if transitive:
+            log.warning(
+                "Group delta queries do not cover nested groups; "
+                "using transitive member listing instead"
+            )
+        else:
+            device_ids = _fetch_group_device_ids_delta(
+                graph, unique_ids, delta_state, max_workers=max_workers
+            )
+            log.info(
+                "Found %d Azure AD devices from %d group(s) (delta)",
+                len(device_ids),
+                len(group_ids),
+            )
+            return device_ids
+    first_pages = graph.batch(
+        [
+            {
+                "id": group_id,
+                "method": "GET",
+                "url": _group_members_path(group_id, transitive=transitive),
+            }
+            for group_id in unique_ids
+        ],
+        max_workers=max_workers,
+    )
+
+    device_ids: set[str] = set()
+    next_links: list[tuple[str, str]] = []
+    for group_id in unique_ids:
+        item = first_pages.get(group_id) or {}
+        status = item.get("status")
+        body = item.get("body") or {}
+        if status != 200:
+            _group_fetch_failed(group_id, status, body.get("error") or f"HTTP {status}")
+            continue
+        device_ids.update(dev["id"] for dev in body.get("value", []) if dev.get("id"))
+        next_link = body.get("@odata.nextLink")
+        if next_link:
+            next_links.append((group_id, next_link))
+
+    def _remaining_pages(group_link: tuple[str, str]) -> set[str]:
+        group_id, next_link = group_link
+        try:
+            return {dev["id"] for dev in graph.iter_paginated(next_link) if dev.get("id")}
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            _group_fetch_failed(group_id, status, e)
+            return set()
+
+    if next_links:
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(next_links))),
+            thread_name_prefix="graph-groups",
+        ) as pool:
+            for ids in pool.map(_remaining_pages, next_links):
+                device_ids.update(ids)
+
+    log.info("Found %d Azure AD devices from %d group(s)", len(device_ids), len(group_ids))
+    return device_ids
+
+
+def _managed_device_select(custom_fields: dict[str, str] | None = None) -> str:
+    """``$select`` for managedDevices: the sync's own fields plus mapped custom-field keys."""
+    fields = MANAGED_DEVICE_SELECT.split(",")
+    for key in custom_fields or {}:
+        root = key.split(".", 1)[0]
+        if (
+            not root
+            or key.startswith("_")
+            or root in fields
+            or root in DETAIL_ONLY_DEVICE_PROPERTIES
+        ):
+            continue
+        if root not in MANAGED_DEVICE_PROPERTIES:
+            log.warning(
+                "SNIPEIT_CUSTOM_FIELDS key %r is not a known managedDevice property; "
+                "skipping it",
+                key,
+            )
+            continue
+        fields.append(root)
+    return ",".join(fields)
+
+
+def _managed_devices_url(
+    platform: str,
+    since: datetime | None = None,
+    *,
+    azure_ad_device_ids: list[str] | None = None,
+    relative: bool = False,
+    os_filter: str | None = None,
+    select: str = MANAGED_DEVICE_SELECT,
+) -> str:
+    query: dict[str, str] = {"$select": select}
+    filters: list[str] = []
+    if azure_ad_device_ids:
+        filters.append(
+            "("
+            + " or ".join(f"azureADDeviceId eq '{did}'" for did in azure_ad_device_ids)
+            + ")"
+        )
+    odata_filter = os_filter or PLATFORM_ODATA_FILTERS.get(platform)
+    if odata_filter:
+        filters.append(odata_filter)
+    if since is not None:
+        filters.append(f"lastSyncDateTime ge {_graph_datetime(since)}")
+    if filters:
+        query["$filter"] = " and ".join(filters)
+    base = "" if relative else "https://graph.microsoft.com/v1.0"
+    return f"{base}/deviceManagement/managedDevices?" + urlencode(query, safe=",'()")
 
 
 def _platform_matches_client(device: dict, platform: str) -> bool:
@@ -1303,29 +2787,252 @@ def _platform_matches_client(device: dict, platform: str) -> bool:
     return False
 
 
-def fetch_managed_devices(
-    graph: GraphClient, platform: str, group_ids: list[str] | None = None
-) -> list[dict]:
-    azure_ad_device_ids = fetch_group_device_ids(graph, group_ids or [])
-    if azure_ad_device_ids is not None and len(azure_ad_device_ids) == 0:
-        log.warning("No devices found in specified groups, nothing to sync")
-        return []
+def _all_platform_filters() -> list[str]:
+    """Per-OS filters covering every device: one per platform plus a catch-all."""
+    filters = list(PLATFORM_ODATA_FILTERS.values())
+    filters.append(" and ".join(f.replace(" eq ", " ne ") for f in filters))
+    return filters
 
-    url = _managed_devices_url(platform)
-    all_devices = graph.get_paginated(url)
 
-    devices: list[dict] = []
-    for dev in all_devices:
+def iter_managed_devices(
+    graph: GraphClient,
+    platform: str,
+    azure_ad_device_ids: set[str] | None = None,
+    *,
+    since: datetime | None = None,
+    os_filter: str | None = None,
+    select: str = MANAGED_DEVICE_SELECT,
+) -> Iterator[dict]:
+    """Stream managed devices, applying platform and group filters per page."""
+    url = _managed_devices_url(platform, since, os_filter=os_filter, select=select)
+    for dev in graph.iter_paginated(url):
         if not _platform_matches_client(dev, platform):
             continue
         if azure_ad_device_ids is not None:
             device_id = dev.get("azureADDeviceId") or dev.get("azureActiveDeviceId")
             if device_id not in azure_ad_device_ids:
                 continue
-        devices.append(dev)
+        yield dev
+
+
+def _use_device_id_filter(
+    graph: GraphClient, platform: str, group_size: int, config: SyncConfig
+) -> bool:
+    """Decide whether per-device ``$filter`` lookups beat listing the tenant.
+
+    The tenant size is estimated with ``$count``; targeted lookups are used
+    when the group set is at most ``group_filter_ratio`` of it.
+    """
+    if config.group_filter_ratio <= 0:
+        return False
+    total = graph.get_count(_managed_devices_url(platform))
+    if total is None:
+        return False
+    use_filter = group_size <= total * config.group_filter_ratio
+    log.info(
+        "Group devices: %d of ~%d managed devices; %s",
+        group_size,
+        total,
+        "querying them by azureADDeviceId" if use_filter else "listing all managed devices",
+    )
+    return use_filter
+
+
+def fetch_managed_devices_by_ids(
+    graph: GraphClient,
+    platform: str,
+    azure_ad_device_ids: set[str],
+    *,
+    since: datetime | None = None,
+    max_workers: int = 1,
+    select: str = MANAGED_DEVICE_SELECT,
+) -> list[dict] | None:
+    """Look up managed devices by ``azureADDeviceId`` through batched ``$filter`` queries.
+
+    Returns None if any lookup fails so the caller can fall back to the full listing.
+    """
+    ordered = sorted(azure_ad_device_ids)
+    chunks = [
+        ordered[i : i + GRAPH_DEVICE_ID_FILTER_SIZE]
+        for i in range(0, len(ordered), GRAPH_DEVICE_ID_FILTER_SIZE)
+    ]
+    responses = graph.batch(
+        [
+            {
+                "id": str(i),
+                "method": "GET",
+                "url": _managed_devices_url(
+                    platform,
+                    since,
+                    azure_ad_device_ids=chunk,
+                    relative=True,
+                    select=select,
+                ),
+            }
+            for i, chunk in enumerate(chunks)
+        ],
+        max_workers=max_workers,
+    )
+    devices: dict[str, dict] = {}
+    for i in range(len(chunks)):
+        item = responses.get(str(i)) or {}
+        status = item.get("status")
+        if status != 200:
+            log.warning(
+                "Managed device lookup by azureADDeviceId failed (HTTP %s); "
+                "falling back to the full listing",
+                status,
+            )
+            return None
+        body = item.get("body") or {}
+        page = list(body.get("value") or [])
+        if body.get("@odata.nextLink"):
+            try:
+                page.extend(graph.iter_paginated(body["@odata.nextLink"]))
+            except requests.exceptions.RequestException as exc:
+                log.warning(
+                    "Managed device lookup by azureADDeviceId failed while paging (%s); "
+                    "falling back to the full listing",
+                    exc,
+                )
+                return None
+        for dev in page:
+            if not _platform_matches_client(dev, platform):
+                continue
+            device_id = dev.get("azureADDeviceId") or dev.get("azureActiveDeviceId")
+            if device_id not in azure_ad_device_ids:
+                continue
+            devices.setdefault(dev.get("id") or str(len(devices)), dev)
+    return list(devices.values())
+
+
+def fetch_all_platforms_parallel(
+    graph: GraphClient,
+    azure_ad_device_ids: set[str] | None = None,
+    *,
+    since: datetime | None = None,
+    select: str = MANAGED_DEVICE_SELECT,
+) -> list[dict]:
+    """List every platform as independent page chains and merge them.
+
+    Chains are concatenated in a fixed order and de-duplicated by device id,
+    so the result does not depend on which chain finished first.
+    """
+    filters = _all_platform_filters()
+
+    def _chain(os_filter: str) -> list[dict]:
+        return list(
+            iter_managed_devices(
+                graph,
+                "all",
+                azure_ad_device_ids,
+                since=since,
+                os_filter=os_filter,
+                select=select,
+            )
+        )
+
+    devices: dict[str, dict] = {}
+    with ThreadPoolExecutor(
+        max_workers=len(filters), thread_name_prefix="graph-platforms"
+    ) as pool:
+        for chain in pool.map(_chain, filters):
+            for dev in chain:
+                devices.setdefault(dev.get("id") or str(len(devices)), dev)
+    return list(devices.values())
+
+
+def fetch_managed_devices(
+    graph: GraphClient,
+    platform: str,
+    group_ids: list[str] | None = None,
+    *,
+    since: datetime | None = None,
+    config: SyncConfig | None = None,
+    group_delta_state: dict[str, Any] | None = None,
+    group_members: dict[str, Any] | None = None,
+) -> list[dict]:
+    """Managed devices for ``platform``, limited to ``group_ids`` when given.
+
+    ``group_members`` holds the group filter's ``azureADDeviceId`` list from
+    the last run under ``"ids"`` and is updated in place. On an incremental
+    run, members that are new since then are looked up without ``since``: a
+    device added to a group need not have checked in with Intune.
+    """
+    config = config or SyncConfig()
+    azure_ad_device_ids = fetch_group_device_ids(
+        graph,
+        group_ids or [],
+        transitive=config.group_transitive,
+        max_workers=config.graph_batch_workers,
+        delta_state=group_delta_state,
+    )
+    if azure_ad_device_ids is not None and len(azure_ad_device_ids) == 0:
+        log.warning("No devices found in specified groups, nothing to sync")
+        return []
+    new_members: set[str] = set()
+    if group_members is not None and azure_ad_device_ids is not None:
+        if since is not None:
+            new_members = azure_ad_device_ids - set(group_members.get("ids") or [])
+        group_members["ids"] = sorted(azure_ad_device_ids)
+    select = _managed_device_select(config.custom_fields)
+    devices = _list_managed_devices(
+        graph, platform, azure_ad_device_ids, since=since, config=config, select=select
+    )
+    if new_members:
+        log.info(
+            "Listing %d new group member(s) without the incremental filter",
+            len(new_members),
+        )
+        added = fetch_managed_devices_by_ids(
+            graph,
+            platform,
+            new_members,
+            max_workers=config.graph_batch_workers,
+            select=select,
+        )
+        if added is None:
+            added = _list_managed_devices(
+                graph, platform, new_members, since=None, config=config, select=select
+            )
+        listed = {dev.get("id") for dev in devices}
+        devices.extend(dev for dev in added if dev.get("id") not in listed)
     return devices
 
 
+def _list_managed_devices(
+    graph: GraphClient,
+    platform: str,
+    azure_ad_device_ids: set[str] | None,
+    *,
+    since: datetime | None,
+    config: SyncConfig,
+    select: str,
+) -> list[dict]:
+    if azure_ad_device_ids and _use_device_id_filter(
+        graph, platform, len(azure_ad_device_ids), config
+    ):
+        devices = fetch_managed_devices_by_ids(
+            graph,
+            platform,
+            azure_ad_device_ids,
+            since=since,
+            max_workers=config.graph_batch_workers,
+            select=select,
+        )
+        if devices is not None:
+            return devices
+    if platform == "all" and config.parallel_platforms:
+        return fetch_all_platforms_parallel(
+            graph, azure_ad_device_ids, since=since, select=select
+        )
+    return list(
+        iter_managed_devices(
+            graph, platform, azure_ad_device_ids, since=since, select=select
+        )
+    )
+
+
 class SyncOutcome(str, Enum):
     SKIPPED_NO_SERIAL = "skipped_no_serial"
     SKIPPED_NO_MODEL = "skipped_no_model"
@@ -1334,6 +3041,8 @@ class SyncOutcome(str, Enum):
     DRY_RUN_CREATE = "dry_run_create"
     DRY_RUN_LIFECYCLE = "dry_run_lifecycle"
     UPDATED = "updated"
+    UNCHANGED = "unchanged"
+    SKIPPED_UNCHANGED = "skipped_unchanged"
     UPDATE_FAILED = "update_failed"
     CREATED = "created"
     CREATE_FAILED = "create_failed"
@@ -1344,6 +3053,105 @@ class SyncOutcome(str, Enum):
     LIFECYCLE_PENDING_AUTOPILOT = "lifecycle_pending_autopilot"
     LIFECYCLE_ARCHIVED = "lifecycle_archived"
     LIFECYCLE_FAILED = "lifecycle_failed"
+    LIFECYCLE_UNCHANGED = "lifecycle_unchanged"
+
+
+# Outcomes after which an identical fingerprint lets the next run skip the device.
+FINGERPRINT_REUSABLE_OUTCOMES = frozenset({
+    SyncOutcome.CREATED.value,
+    SyncOutcome.UPDATED.value,
+    SyncOutcome.UNCHANGED.value,
+    SyncOutcome.SKIPPED_UNCHANGED.value,
+})
+
+# Failed outcomes are never checkpointed as done (--resume syncs those devices
+# again) and hold the incremental watermark back until the device succeeds.
+FAILED_OUTCOMES = frozenset({
+    SyncOutcome.UPDATE_FAILED.value,
+    SyncOutcome.CREATE_FAILED.value,
+    SyncOutcome.CREATED_CHECKOUT_FAILED.value,
+    SyncOutcome.UPDATED_CHECKOUT_FAILED.value,
+    SyncOutcome.LIFECYCLE_FAILED.value,
+})
+
+# Lifecycle remembered per serial once applied; Snipe-IT is only written on a change.
+LIFECYCLE_STATES: dict[SyncOutcome, str] = {
+    SyncOutcome.LIFECYCLE_ARCHIVED: "archived",
+    SyncOutcome.LIFECYCLE_PENDING_AUTOPILOT: "pending_autopilot",
+    SyncOutcome.LIFECYCLE_PENDING_RETIRE: "pending_retire",
+    SyncOutcome.CHECKED_IN_STALE: "checked_in_stale",
+}
+
+# Lifecycle of an absent serial that has no Snipe-IT asset; reconciliation stops there.
+LIFECYCLE_ABSENT = "absent"
+
+# Absent serials in these lifecycles are dropped after SYNC_STATE_RETENTION_DAYS.
+PRUNABLE_LIFECYCLES = frozenset({"archived", LIFECYCLE_ABSENT})
+
+# Failed lifecycle writes for an absent serial before it is dropped from the state.
+LIFECYCLE_MAX_ATTEMPTS = 3
+
+
+def _device_fingerprint(
+    device: dict,
+    upn: str | None,
+    autopilot: dict | None,
+    config: SyncConfig,
+) -> str:
+    """Stable hash of every input that shapes what the sync writes to Snipe-IT."""
+    data: dict[str, Any] = {
+        "device": {key: device.get(key) for key in FINGERPRINT_DEVICE_FIELDS},
+        "custom": {key: _device_field(device, key) for key in sorted(config.custom_fields)},
+        "upn": upn,
+        "autopilot": (autopilot or {}).get("enrollmentState"),
+        "stale": bool(config.stale_days and _device_is_stale(device, config.stale_days)),
+        "config": {
+            "checkout_mode": config.checkout_mode,
+            "location_prefix_len": config.location_prefix_len,
+            "company_id": config.company_id,
+            "custom_fields": config.custom_fields,
+            "compliance_status_map": config.compliance_status_map,
+            "default_status_name": config.default_status_name,
+            "checkout_status_name": config.checkout_status_name,
+            "notes_change_policy": config.notes_change_policy,
+        },
+    }
+    if config.notes_change_policy == "always":
+        data["volatile"] = [
+            device.get("lastSyncDateTime"),
+            (autopilot or {}).get("lastContactedDateTime"),
+        ]
+    encoded = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _fingerprint_unchanged(
+    entry: dict | None,
+    fingerprint: str,
+    config: SyncConfig,
+    now: datetime,
+) -> bool:
+    """True when the previous run fully synced this exact device state recently.
+
+    Never true once a lifecycle was applied (archived, pending, checked in):
+    the fingerprint predates it and the asset must be restored by a full sync.
+    """
+    if not entry or entry.get("fingerprint") != fingerprint:
+        return False
+    if entry.get("lifecycle"):
+        return False
+    if entry.get("outcome") not in FINGERPRINT_REUSABLE_OUTCOMES:
+        return False
+    verified_at = _parse_graph_datetime(entry.get("verified_at"))
+    if verified_at is None:
+        return False
+    if verified_at.tzinfo is None:
+        verified_at = verified_at.replace(tzinfo=timezone.utc)
+    if config.force_refresh_hours and now - verified_at >= timedelta(
+        hours=config.force_refresh_hours
+    ):
+        return False
+    return True
 
 
 def _assigned_user_id(asset: dict | None) -> int | None:
@@ -1435,6 +3243,11 @@ def _apply_checkout_if_needed(
     return ok
 
 
+def _remember_snipe_asset(device: dict, asset: dict | None) -> None:
+    """Note the asset id on the device for the sync state."""
+    device["_snipe_asset_id"] = asset.get("id") if asset else None
+
+
 def _checkin_if_assigned(
     snipe: SnipeITClient,
     asset: dict,
@@ -1498,7 +3311,15 @@ def _sync_device_retiring(
     if not serial:
         return SyncOutcome.SKIPPED_NO_SERIAL
 
-    existing = snipe.ensure_asset_for_sync(serial, config=config)
+    pending_retire = LIFECYCLE_STATES[SyncOutcome.LIFECYCLE_PENDING_RETIRE]
+    if device.get("_lifecycle") == pending_retire:
+        log.debug("Retiring device '%s' already marked; no lifecycle update", device_name)
+        return SyncOutcome.LIFECYCLE_UNCHANGED
+
+    existing = snipe.ensure_asset_for_sync(
+        serial, config=config, asset_id=device.get("_snipe_asset_id")
+    )
+    _remember_snipe_asset(device, existing)
     if not existing:
         log.info(
             "Retiring device '%s' has no Snipe asset (serial %s); nothing to update",
@@ -1526,11 +3347,10 @@ def _sync_device_retiring(
     )
     if dry_run:
         return SyncOutcome.DRY_RUN_LIFECYCLE
-    return (
-        SyncOutcome.LIFECYCLE_PENDING_RETIRE
-        if ok
-        else SyncOutcome.LIFECYCLE_FAILED
-    )
+    if not ok:
+        return SyncOutcome.LIFECYCLE_FAILED
+    device["_lifecycle"] = pending_retire
+    return SyncOutcome.LIFECYCLE_PENDING_RETIRE
 
 
 def reconcile_missing_devices(
@@ -1544,18 +3364,39 @@ def reconcile_missing_devices(
     default_status_id: int,
     status_ids: dict[str, int | None],
     dry_run: bool,
+    sync_state: dict[str, Any] | None = None,
 ) -> dict[SyncOutcome, int]:
+    """Move assets of serials that left Intune to Pending Autopilot or Archived.
+
+    Only transitions are written: a serial whose remembered ``lifecycle``
+    already matches is left alone. Absent entries are carried into
+    ``sync_state`` (with the lifecycle applied this run) so they stay tracked,
+    until they have been archived or absent from Snipe-IT for
+    ``state_retention_days`` or failed ``LIFECYCLE_MAX_ATTEMPTS`` times.
+    """
     counts: dict[SyncOutcome, int] = {o: 0 for o in SyncOutcome}
     if not config.lifecycle_reconciliation or not config.sync_state_file:
         return counts
 
-    for serial, entry in previous_state.items():
-        if not isinstance(entry, dict):
-            continue
+    now = datetime.now(tz=timezone.utc)
+    for serial, entry in _state_entries(previous_state):
         if serial in current_intune_serials:
             continue
         if not _state_entry_in_scope(entry, platform):
             continue
+        if entry.get("lifecycle") in PRUNABLE_LIFECYCLES and config.state_retention_days:
+            lifecycle_at = _parse_graph_datetime(entry.get("lifecycle_at"))
+            if lifecycle_at and lifecycle_at.tzinfo is None:
+                lifecycle_at = lifecycle_at.replace(tzinfo=timezone.utc)
+            if lifecycle_at and now - lifecycle_at >= timedelta(
+                days=config.state_retention_days
+            ):
+                log.debug("Dropping serial %s from sync state (%s)", serial, entry["lifecycle"])
+                continue
+        if sync_state is not None:
+            sync_state[serial] = entry
+            if entry.get("lifecycle") and not entry.get("lifecycle_at"):
+                sync_state[serial] = {**entry, "lifecycle_at": _graph_datetime(now)}
 
         ap_record = autopilot_by_serial.get(serial.casefold())
         is_windows = (entry.get("platform") or "").casefold() == "windows"
@@ -1570,12 +3411,28 @@ def reconcile_missing_devices(
             notes_extra = "lifecycle: removed from Intune"
             archived = True
 
-        existing = snipe.ensure_asset_for_sync(serial, config=config)
+        lifecycle = LIFECYCLE_STATES[outcome]
+        if entry.get("lifecycle") in (lifecycle, LIFECYCLE_ABSENT):
+            log.debug(
+                "Serial %s already %s; no lifecycle update", serial, entry["lifecycle"]
+            )
+            counts[SyncOutcome.LIFECYCLE_UNCHANGED] += 1
+            continue
+
+        existing = snipe.ensure_asset_for_sync(
+            serial, config=config, asset_id=entry.get("asset_id")
+        )
         if not existing:
             log.debug(
                 "No Snipe asset for missing Intune serial %s; skipping reconciliation",
                 serial,
             )
+            if sync_state is not None and not dry_run:
+                sync_state[serial] = {
+                    **entry,
+                    "lifecycle": LIFECYCLE_ABSENT,
+                    "lifecycle_at": _graph_datetime(now),
+                }
             continue
 
         pseudo_device = {
@@ -1609,8 +3466,30 @@ def reconcile_missing_devices(
                 existing["id"],
                 serial,
             )
+            if sync_state is not None:
+                applied = {
+                    **entry,
+                    "lifecycle": lifecycle,
+                    "lifecycle_at": _graph_datetime(now),
+                    "asset_id": existing.get("id"),
+                }
+                applied.pop("lifecycle_failures", None)
+                sync_state[serial] = applied
         else:
             counts[SyncOutcome.LIFECYCLE_FAILED] += 1
+            failures = int(entry.get("lifecycle_failures") or 0) + 1
+            if sync_state is None:
+                continue
+            if failures >= LIFECYCLE_MAX_ATTEMPTS:
+                log.warning(
+                    "Lifecycle update for serial %s failed %d times; dropping it from "
+                    "sync state",
+                    serial,
+                    failures,
+                )
+                sync_state.pop(serial, None)
+            else:
+                sync_state[serial] = {**entry, "lifecycle_failures": failures}
 
     return counts
 
@@ -1644,6 +3523,180 @@ def _resolve_startup_status_id(
     )
 
 
+def _timed(phase: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run one startup phase and log how long it took."""
+    started = time.monotonic()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        log.info("Startup phase '%s' took %.1fs", phase, time.monotonic() - started)
+
+
+def _run_startup_phases(
+    phases: list[tuple[str, Callable[[], Any]]],
+    *,
+    on_failure: Callable[[], None],
+) -> list[Any]:
+    """Run independent startup phases side by side; return their results in order.
+
+    Phases run on daemon threads. The first one to raise calls ``on_failure``
+    and re-raises at once: phases still paging do not hold up the exit.
+    """
+    futures: list[Future] = []
+    for name, func in phases:
+        future: Future = Future()
+
+        def _run(future: Future = future, name: str = name, func: Callable = func) -> None:
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(_timed(name, func))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        threading.Thread(target=_run, name=f"startup-{name}", daemon=True).start()
+        futures.append(future)
+    done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+    for future in futures:
+        exc = future.exception() if future in done else None
+        if exc is not None:
+            on_failure()
+            raise exc
+    return [future.result() for future in futures]
+
+
+def bootstrap_snipe(
+    snipe: SnipeITClient,
+    config: SyncConfig,
+    *,
+    dry_run: bool,
+) -> tuple[int | None, int | None, dict[str, int | None]]:
+    """Resolve category and status labels (StartupError when a required one is missing).
+
+    Returns ``(category_id, default_status_id, lifecycle_status_ids)``. Index
+    preloads that do not depend on the device list run here as well.
+    """
+    if config.preload_taxonomy:
+        snipe.preload_taxonomy()
+    category_id = snipe.get_or_create_category("Intune", dry_run=dry_run)
+    default_status_id = _resolve_startup_status_id(
+        snipe,
+        config.default_status_name,
+        auto_create=config.auto_create_default_status,
+        dry_run=dry_run,
+    )
+    if _status_unavailable(
+        default_status_id,
+        auto_create=config.auto_create_default_status,
+        dry_run=dry_run,
+    ):
+        raise StartupError(
+            f"Cannot proceed without status label '{config.default_status_name}' "
+            "(create it in Snipe-IT or use the built-in default name)"
+        )
+
+    if config.checkout_status_name:
+        checkout_id = snipe.get_status_id(config.checkout_status_name)
+        if checkout_id is None:
+            raise StartupError(
+                f"Checkout status label '{config.checkout_status_name}' not found"
+            )
+        snipe._checkout_status_id = checkout_id
+    elif default_status_id is not None:
+        snipe._checkout_status_id = default_status_id
+
+    if config.checkin_status_name:
+        checkin_id = snipe.get_status_id(config.checkin_status_name)
+        if checkin_id is None:
+            raise StartupError(f"Checkin status label '{config.checkin_status_name}' not found")
+        snipe._checkin_status_id = checkin_id
+    elif default_status_id is not None:
+        snipe._checkin_status_id = default_status_id
+
+    lifecycle_status_ids: dict[str, int | None] = {
+        "pending_retire": _resolve_startup_status_id(
+            snipe,
+            config.status_pending_retire,
+            auto_create=config.auto_create_pending_retire,
+            dry_run=dry_run,
+        ),
+    }
+    if _status_unavailable(
+        lifecycle_status_ids["pending_retire"],
+        auto_create=config.auto_create_pending_retire,
+        dry_run=dry_run,
+    ):
+        log.warning(
+            "Lifecycle status label '%s' not found; retiring devices use default status",
+            config.status_pending_retire,
+        )
+    if config.lifecycle_reconciliation and config.sync_state_file:
+        lifecycle_status_ids["pending_autopilot"] = _resolve_startup_status_id(
+            snipe,
+            config.status_pending_autopilot,
+            auto_create=config.auto_create_pending_autopilot,
+            dry_run=dry_run,
+        )
+        lifecycle_status_ids["archived"] = _resolve_startup_status_id(
+            snipe,
+            config.status_archived,
+            auto_create=config.auto_create_archived,
+            dry_run=dry_run,
+        )
+        for label, sid, auto_create in (
+            (
+                config.status_pending_autopilot,
+                lifecycle_status_ids["pending_autopilot"],
+                config.auto_create_pending_autopilot,
+            ),
+            (
+                config.status_archived,
+                lifecycle_status_ids["archived"],
+                config.auto_create_archived,
+            ),
+        ):
+            if _status_unavailable(sid, auto_create=auto_create, dry_run=dry_run):
+                raise StartupError(
+                    f"Lifecycle status label '{label}' not found in Snipe-IT "
+                    "(required when SYNC_STATE_FILE is set)"
+                )
+
+    if config.preload_assets:
+        snipe.preload_asset_index()
+    if config.preload_users and config.checkout_mode == "user":
+        snipe.preload_user_index()
+    if config.preload_locations and config.checkout_mode == "location":
+        snipe.preload_location_index()
+    return category_id, default_status_id, lifecycle_status_ids
+
+
+def prepare_taxonomy(
+    snipe: SnipeITClient,
+    devices: list[dict],
+    category_id: int | None,
+    config: SyncConfig,
+    *,
+    dry_run: bool = False,
+) -> int:
+    """Resolve or create every distinct (manufacturer, model) pair up front.
+
+    Afterwards ``sync_device`` only hits the client's in-memory caches.
+    Devices that ``sync_device`` would not model-match (no serial, retiring,
+    stale) are left out so no taxonomy is created on their behalf.
+    """
+    pairs: dict[tuple[str, str], None] = {}
+    for dev in devices:
+        if not dev.get("serialNumber") or _device_in_retire_state(dev):
+            continue
+        if config.stale_days and _device_is_stale(dev, config.stale_days):
+            continue
+        pairs[(dev.get("manufacturer") or "", dev.get("model") or "")] = None
+    for man_name, mod_number in pairs:
+        man_id = snipe.get_or_create_manufacturer(man_name, dry_run=dry_run)
+        snipe.get_or_create_model(mod_number, man_id, category_id, dry_run=dry_run)
+    log.info("Resolved %d distinct manufacturer/model pair(s) up front", len(pairs))
+    return len(pairs)
+
+
 def sync_device(
     snipe: SnipeITClient,
     device: dict,
@@ -1652,7 +3705,7 @@ def sync_device(
     config: SyncConfig,
     *,
     dry_run: bool = False,
-    primary_upns: dict[str, str] | None = None,
+    primary_upns: dict[str, str | None] | None = None,
     autopilot: dict | None = None,
     status_ids: dict[str, int | None] | None = None,
 ) -> SyncOutcome:
@@ -1686,7 +3739,14 @@ def sync_device(
     )
 
     if config.stale_days and _device_is_stale(device, config.stale_days):
-        existing = snipe.ensure_asset_for_sync(serial, config=config)
+        checked_in = LIFECYCLE_STATES[SyncOutcome.CHECKED_IN_STALE]
+        if device.get("_lifecycle") == checked_in:
+            log.debug("Stale device '%s' already checked in; nothing to do", device_name)
+            return SyncOutcome.SKIPPED_STALE
+        existing = snipe.ensure_asset_for_sync(
+            serial, config=config, asset_id=device.get("_snipe_asset_id")
+        )
+        _remember_snipe_asset(device, existing)
         if existing:
             asset_id = existing["id"]
             if dry_run:
@@ -1695,11 +3755,16 @@ def sync_device(
             if _assigned_target_id(existing, checkout_mode) is not None:
                 if snipe.checkin_asset(asset_id):
                     log.info("Checked in stale asset %d: %s", asset_id, device_name)
+                    device["_lifecycle"] = checked_in
                     return SyncOutcome.CHECKED_IN_STALE
                 return SyncOutcome.UPDATED_CHECKOUT_FAILED
+            device["_lifecycle"] = checked_in
         log.info("Skipping stale device '%s' (no asset to check in)", device_name)
         return SyncOutcome.SKIPPED_STALE
 
+    # Active again: forget any lifecycle applied while it was stale or retiring.
+    device["_lifecycle"] = None
+
     man_name = device.get("manufacturer")
     mod_number = device.get("model")
     man_id = snipe.get_or_create_manufacturer(man_name, dry_run=dry_run)
@@ -1717,7 +3782,10 @@ def sync_device(
         return SyncOutcome.SKIPPED_NO_MODEL
 
     status_id = _resolve_status_id(snipe, device, default_status_id, config)
-    existing = snipe.ensure_asset_for_sync(serial, config=config)
+    existing = snipe.ensure_asset_for_sync(
+        serial, config=config, asset_id=device.get("_snipe_asset_id")
+    )
+    _remember_snipe_asset(device, existing)
 
     checkout_on_create = (
         config.checkout_on_create
@@ -1743,6 +3811,14 @@ def sync_device(
         )
         if existing.get("archived") in (True, 1, "1"):
             update_payload["archived"] = 0
+        if not _asset_payload_changes(update_payload, existing, config):
+            log.debug("Asset %d unchanged; skipping update: %s", asset_id, device_name)
+            if not _apply_checkout_if_needed(
+                snipe, asset_id, checkout_mode, checkout_target_id, upn, existing,
+                dry_run=dry_run,
+            ):
+                return SyncOutcome.UPDATED_CHECKOUT_FAILED
+            return SyncOutcome.UNCHANGED
         if dry_run:
             log.info("[DRY RUN] Would update existing asset %d (%s)", asset_id, device_name)
             if not _apply_checkout_if_needed(
@@ -1793,6 +3869,7 @@ def sync_device(
         return SyncOutcome.CREATE_FAILED
     asset_id = asset["id"]
     log.info("Created asset %d: %s", asset_id, device_name)
+    device["_snipe_asset_id"] = asset_id
 
     if checkout_target_id and not checkout_on_create:
         if not _apply_checkout_if_needed(
@@ -1802,11 +3879,76 @@ def sync_device(
     return SyncOutcome.CREATED
 
 
+def run_device_sync(
+    devices: list[dict],
+    sync_one: Callable[[dict], SyncOutcome],
+    *,
+    workers: int = 1,
+    on_result: Callable[[dict, SyncOutcome], None] | None = None,
+) -> list[SyncOutcome]:
+    """Run ``sync_one`` per device; outcomes are returned in device order.
+
+    ``on_result(device, outcome)`` runs on the calling thread as each
+    outcome is collected.
+    """
+    if workers <= 1 or len(devices) <= 1:
+        return _collect_outcomes(devices, map(sync_one, devices), on_result)
+    log.info("Syncing %d device(s) with %d worker(s)", len(devices), workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync") as pool:
+        try:
+            return _collect_outcomes(devices, pool.map(sync_one, devices), on_result)
+        except BaseException:
+            # Stop queued devices instead of draining the whole list on the way out.
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+
+def _collect_outcomes(
+    devices: list[dict],
+    results: Iterator[SyncOutcome],
+    on_result: Callable[[dict, SyncOutcome], None] | None,
+) -> list[SyncOutcome]:
+    outcomes: list[SyncOutcome] = []
+    for dev, outcome in zip(devices, results):
+        outcomes.append(outcome)
+        if on_result is not None:
+            on_result(dev, outcome)
+    return outcomes
+
+
+def _sync_state_entry(
+    dev: dict,
+    outcome: SyncOutcome,
+    previous: dict | None = None,
+) -> dict[str, Any]:
+    now = datetime.now(tz=timezone.utc).isoformat()
+    if outcome == SyncOutcome.SKIPPED_UNCHANGED:
+        verified_at = (previous or {}).get("verified_at")
+    else:
+        verified_at = now
+    return {
+        "intune_id": dev.get("id"),
+        "device_name": dev.get("deviceName"),
+        "platform": _device_platform_key(dev),
+        "manufacturer": dev.get("manufacturer"),
+        "model": dev.get("model"),
+        "last_sync": dev.get("lastSyncDateTime"),
+        "management_state": dev.get("managementState"),
+        "outcome": outcome.value,
+        "synced_at": now,
+        "fingerprint": dev.get("_fingerprint"),
+        "verified_at": verified_at,
+        "asset_id": dev.get("_snipe_asset_id", (previous or {}).get("asset_id")),
+        "lifecycle": dev.get("_lifecycle", (previous or {}).get("lifecycle")),
+    }
+
+
 def _format_summary(counts: dict[SyncOutcome, int], dry_run: bool) -> str:
     parts = []
     for key, label in (
         (SyncOutcome.CREATED, "created"),
         (SyncOutcome.UPDATED, "updated"),
+        (SyncOutcome.UNCHANGED, "unchanged"),
         (SyncOutcome.CREATE_FAILED, "create failed"),
         (SyncOutcome.UPDATE_FAILED, "update failed"),
         (SyncOutcome.CREATED_CHECKOUT_FAILED, "created (checkout failed)"),
@@ -1816,9 +3958,11 @@ def _format_summary(counts: dict[SyncOutcome, int], dry_run: bool) -> str:
         (SyncOutcome.LIFECYCLE_PENDING_AUTOPILOT, "lifecycle pending autopilot"),
         (SyncOutcome.LIFECYCLE_ARCHIVED, "lifecycle archived"),
         (SyncOutcome.LIFECYCLE_FAILED, "lifecycle failed"),
+        (SyncOutcome.LIFECYCLE_UNCHANGED, "lifecycle unchanged"),
         (SyncOutcome.SKIPPED_NO_SERIAL, "skipped (no serial)"),
         (SyncOutcome.SKIPPED_NO_MODEL, "skipped (no model)"),
         (SyncOutcome.SKIPPED_STALE, "skipped (stale)"),
+        (SyncOutcome.SKIPPED_UNCHANGED, "skipped (unchanged since last run)"),
         (SyncOutcome.DRY_RUN_CREATE, "would create"),
         (SyncOutcome.DRY_RUN_UPDATE, "would update"),
         (SyncOutcome.DRY_RUN_LIFECYCLE, "would lifecycle update"),
@@ -1845,6 +3989,19 @@ def main() -> None:
         help="Resolve assignee from Graph primary user (beta /users); "
              "overrides GRAPH_USE_PRIMARY_USER when set",
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its checkpoint in SYNC_STATE_FILE, "
+             "skipping devices it already completed",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Devices synced concurrently against Snipe-IT; "
+             "overrides SYNC_WORKERS when set (default: 1)",
+    )
     args = parser.parse_args()
 
     group_ids: list[str] | None = None
@@ -1854,116 +4011,136 @@ def main() -> None:
         group_ids = _parse_group_ids(os.getenv("AZURE_GROUP_IDS"))
 
     use_primary = True if args.use_primary_user else None
-    config = SyncConfig.from_env(use_primary_user_cli=use_primary)
-
-    graph = GraphClient()
-    snipe = SnipeITClient(config)
-
-    autopilot_by_serial: dict[str, dict] = {}
-    if _platform_includes_windows(args.platform) and not config.skip_autopilot:
-        autopilot_by_serial = graph.fetch_autopilot_by_serial()
-
-    devices = fetch_managed_devices(graph, args.platform, group_ids=group_ids)
-    filter_info = f"platform '{args.platform}'"
-    if group_ids:
-        filter_info += f" and {len(group_ids)} group(s)"
-    log.info("Found %d Intune devices matching %s", len(devices), filter_info)
+    config = SyncConfig.from_env(
+        use_primary_user_cli=use_primary, workers_cli=args.workers
+    )
 
-    primary_upns: dict[str, str] = {}
-    if config.use_primary_user:
-        device_ids = [d["id"] for d in devices if d.get("id")]
-        primary_upns = graph.fetch_primary_user_upns(device_ids)
+    graph_pool_size = config.graph_batch_workers + 2
+    if config.parallel_platforms:
+        graph_pool_size += len(PLATFORM_ODATA_FILTERS) + 1
+    graph = GraphClient(pool_size=graph_pool_size)
+    graph.start_background_refresh()
+    try:
+        _run_sync(args, config, graph, group_ids)
+    finally:
+        graph.stop_background_refresh()
 
-    category_id = snipe.get_or_create_category("Intune", dry_run=args.dry_run)
-    default_status_id = _resolve_startup_status_id(
-        snipe,
-        config.default_status_name,
-        auto_create=config.auto_create_default_status,
-        dry_run=args.dry_run,
-    )
-    if _status_unavailable(
-        default_status_id,
-        auto_create=config.auto_create_default_status,
-        dry_run=args.dry_run,
-    ):
-        log.error(
-            "Cannot proceed without status label '%s' "
-            "(create it in Snipe-IT or use the built-in default name)",
-            config.default_status_name,
-        )
-        sys.exit(1)
 
-    if config.checkout_status_name:
-        checkout_id = snipe.get_status_id(config.checkout_status_name)
-        if checkout_id is None:
-            log.error("Checkout status label '%s' not found", config.checkout_status_name)
-            sys.exit(1)
-        snipe._checkout_status_id = checkout_id
-    elif default_status_id is not None:
-        snipe._checkout_status_id = default_status_id
+def _run_sync(
+    args: argparse.Namespace,
+    config: SyncConfig,
+    graph: GraphClient,
+    group_ids: list[str] | None,
+) -> None:
+    """Everything after argument parsing: list, sync, reconcile and save state."""
+    snipe = SnipeITClient(config)
 
-    if config.checkin_status_name:
-        checkin_id = snipe.get_status_id(config.checkin_status_name)
-        if checkin_id is None:
-            log.error("Checkin status label '%s' not found", config.checkin_status_name)
-            sys.exit(1)
-        snipe._checkin_status_id = checkin_id
-    elif default_status_id is not None:
-        snipe._checkin_status_id = default_status_id
+    state_store = open_sync_state_store(config)
+    previous_state = state_store.load() if state_store is not None else {}
+    run_started = datetime.now(tz=timezone.utc)
+    scope_key = _sync_scope(args.platform, group_ids)
+    since = _incremental_since(previous_state, scope_key, config, run_started)
+
+    group_members: dict[str, Any] | None = None
+    if config.sync_state_file and group_ids:
+        group_members = {}
+        known_members = _scope_meta(previous_state, scope_key).get("group_members")
+        if isinstance(known_members, list):
+            group_members["ids"] = known_members
+
+    group_delta_state: dict[str, Any] | None = None
+    if config.group_delta and config.sync_state_file and group_ids:
+        cached_groups = _state_meta(previous_state).get("group_delta") or {}
+        group_delta_state = {
+            gid: entry for gid, entry in cached_groups.items() if gid in group_ids
+        }
 
-    lifecycle_status_ids: dict[str, int | None] = {
-        "pending_retire": _resolve_startup_status_id(
-            snipe,
-            config.status_pending_retire,
-            auto_create=config.auto_create_pending_retire,
-            dry_run=args.dry_run,
-        ),
-    }
-    if _status_unavailable(
-        lifecycle_status_ids["pending_retire"],
-        auto_create=config.auto_create_pending_retire,
-        dry_run=args.dry_run,
-    ):
-        log.warning(
-            "Lifecycle status label '%s' not found; retiring devices use default status",
-            config.status_pending_retire,
-        )
-    if config.lifecycle_reconciliation and config.sync_state_file:
-        lifecycle_status_ids["pending_autopilot"] = _resolve_startup_status_id(
-            snipe,
-            config.status_pending_autopilot,
-            auto_create=config.auto_create_pending_autopilot,
-            dry_run=args.dry_run,
-        )
-        lifecycle_status_ids["archived"] = _resolve_startup_status_id(
-            snipe,
-            config.status_archived,
-            auto_create=config.auto_create_archived,
-            dry_run=args.dry_run,
+    def _fetch_devices() -> tuple[list[dict], dict[str, str | None]]:
+        devices = fetch_managed_devices(
+            graph,
+            args.platform,
+            group_ids=group_ids,
+            since=since,
+            config=config,
+            group_delta_state=group_delta_state,
+            group_members=group_members,
         )
-        for label, sid, auto_create in (
-            (
-                config.status_pending_autopilot,
-                lifecycle_status_ids["pending_autopilot"],
-                config.auto_create_pending_autopilot,
-            ),
-            (
-                config.status_archived,
-                lifecycle_status_ids["archived"],
-                config.auto_create_archived,
-            ),
-        ):
-            if _status_unavailable(sid, auto_create=auto_create, dry_run=args.dry_run):
-                log.error(
-                    "Lifecycle status label '%s' not found in Snipe-IT "
-                    "(required when SYNC_STATE_FILE is set)",
-                    label,
+        filter_info = f"platform '{args.platform}'"
+        if group_ids:
+            filter_info += f" and {len(group_ids)} group(s)"
+        if since is not None:
+            filter_info += f", incremental since {_graph_datetime(since)}"
+        log.info("Found %d Intune devices matching %s", len(devices), filter_info)
+
+        primary_upns: dict[str, str | None] = {}
+        if config.use_primary_user:
+            primary_upns, device_ids = _cached_primary_upns(devices, previous_state)
+            if primary_upns:
+                log.info(
+                    "Reusing cached primary user for %d device(s); looking up %d",
+                    len(primary_upns),
+                    len(device_ids),
+                )
+            primary_upns.update(
+                _timed(
+                    "primary users",
+                    graph.fetch_primary_user_upns,
+                    device_ids,
+                    max_workers=config.graph_batch_workers,
                 )
-                sys.exit(1)
+            )
 
+        enrich_fields = _enrichment_fields(config.custom_fields)
+        if enrich_fields and devices:
+            details, device_ids = _cached_enrichment(devices, previous_state, enrich_fields)
+            if details:
+                log.info(
+                    "Reusing cached device details for %d device(s); reading %d",
+                    len(details),
+                    len(device_ids),
+                )
+            details.update(
+                _timed(
+                    "device details",
+                    graph.fetch_device_details,
+                    device_ids,
+                    enrich_fields,
+                    max_workers=config.graph_batch_workers,
+                )
+            )
+            for dev in devices:
+                detail = details.get(dev.get("id") or "")
+                if detail is not None:
+                    dev.update(detail)
+                    dev["_enrichment"] = detail
+        return devices, primary_upns
+
+    # Autopilot, the device listing (plus primary users) and the Snipe-IT
+    # bootstrap are independent; run them side by side and join here.
+    # When one fails, Graph is cancelled so queued batch requests stop too.
+    startup_started = time.monotonic()
+    phases: list[tuple[str, Callable[[], Any]]] = [
+        (
+            "snipe-it bootstrap",
+            lambda: bootstrap_snipe(snipe, config, dry_run=args.dry_run),
+        ),
+        ("managed devices", _fetch_devices),
+    ]
+    if _platform_includes_windows(args.platform) and not config.skip_autopilot:
+        phases.append(("autopilot", graph.fetch_autopilot_by_serial))
+    try:
+        results = _run_startup_phases(phases, on_failure=graph.cancel)
+    except StartupError as exc:
+        log.error("%s", exc)
+        sys.exit(1)
+    category_id, default_status_id, lifecycle_status_ids = results[0]
+    devices, primary_upns = results[1]
+    autopilot_by_serial: dict[str, dict] = results[2] if len(results) > 2 else {}
+    log.info("Startup finished in %.1fs", time.monotonic() - startup_started)
     log.info(
         "Using category_id=%s, default_status_id=%s, checkout_mode=%s, "
-        "primary_user=%s, custom_fields=%d, autopilot=%d, lifecycle_reconcile=%s",
+        "primary_user=%s, custom_fields=%d, autopilot=%d, lifecycle_reconcile=%s, "
+        "workers=%d, asset_index=%s",
         category_id,
         default_status_id,
         config.checkout_mode,
@@ -1971,20 +4148,36 @@ def main() -> None:
         len(config.custom_fields),
         len(autopilot_by_serial),
         config.lifecycle_reconciliation and bool(config.sync_state_file),
+        config.workers,
+        config.preload_assets,
     )
 
-    previous_state = load_sync_state(config.sync_state_file)
-    sync_state: dict[str, Any] = {}
-    current_intune_serials: set[str] = set()
-    counts: dict[SyncOutcome, int] = {o: 0 for o in SyncOutcome}
-    for dev in devices:
+    if config.preload_taxonomy:
+        prepare_taxonomy(snipe, devices, category_id, config, dry_run=args.dry_run)
+
+    def _sync_one(dev: dict) -> SyncOutcome:
         ap_record: dict | None = None
         if _is_windows_device(dev) and autopilot_by_serial:
             serial_key = (dev.get("serialNumber") or "").casefold()
             ap_record = autopilot_by_serial.get(serial_key)
             _enrich_device_autopilot(dev, ap_record)
-
-        outcome = sync_device(
+        if config.sync_state_file:
+            upn = _device_user_upn(dev, primary_upns, config)
+            dev["_fingerprint"] = _device_fingerprint(dev, upn, ap_record, config)
+            previous = previous_state.get(dev.get("serialNumber") or "")
+            if isinstance(previous, dict) and previous.get("asset_id") is not None:
+                dev["_snipe_asset_id"] = previous["asset_id"]
+            if isinstance(previous, dict) and previous.get("lifecycle"):
+                dev["_lifecycle"] = previous["lifecycle"]
+            if config.skip_unchanged_devices and _fingerprint_unchanged(
+                previous if isinstance(previous, dict) else None,
+                dev["_fingerprint"],
+                config,
+                run_started,
+            ):
+                log.debug("Skipping unchanged device '%s'", dev.get("deviceName"))
+                return SyncOutcome.SKIPPED_UNCHANGED
+        return sync_device(
             snipe,
             dev,
             category_id=category_id,
@@ -1995,23 +4188,112 @@ def main() -> None:
             autopilot=ap_record,
             status_ids=lifecycle_status_ids,
         )
+
+    sync_state: dict[str, Any] = {}
+    current_intune_serials: set[str] = set()
+    counts: dict[SyncOutcome, int] = {o: 0 for o in SyncOutcome}
+    completed: dict[str, str] = {}
+    pending_devices: list[dict] = devices
+
+    resumed = _resume_checkpoint(previous_state, scope_key)
+    if resumed and not args.resume:
+        log.info(
+            "Ignoring checkpoint of an interrupted run (%d device(s) done); "
+            "pass --resume to continue it",
+            len(resumed),
+        )
+    elif resumed:
+        pending_devices = []
+        for dev in devices:
+            serial = dev.get("serialNumber")
+            entry = previous_state.get(serial or "")
+            if serial in resumed and isinstance(entry, dict):
+                try:
+                    outcome = SyncOutcome(resumed[serial])
+                except ValueError:
+                    pending_devices.append(dev)
+                    continue
+                counts[outcome] += 1
+                completed[serial] = outcome.value
+                current_intune_serials.add(serial)
+                sync_state[serial] = entry
+            else:
+                pending_devices.append(dev)
+        log.info(
+            "Resuming interrupted run: %d device(s) already done, %d to go",
+            len(completed),
+            len(pending_devices),
+        )
+
+    checkpointing = state_store is not None and not args.dry_run
+    stop_requested = threading.Event()
+    recorded = 0
+
+    def _write_checkpoint() -> None:
+        assert state_store is not None
+        state_store.save(
+            _checkpoint_state(
+                previous_state,
+                sync_state,
+                scope_key,
+                completed,
+                started=run_started,
+            ),
+            platform=args.platform,
+            scope_key=scope_key,
+        )
+        log.info("Checkpoint saved (%d device(s) done)", len(completed))
+
+    def _record(dev: dict, outcome: SyncOutcome) -> None:
+        nonlocal recorded
         counts[outcome] += 1
         serial = dev.get("serialNumber")
-        if serial and config.sync_state_file:
-            current_intune_serials.add(serial)
-            sync_state[serial] = {
-                "intune_id": dev.get("id"),
-                "device_name": dev.get("deviceName"),
-                "platform": _device_platform_key(dev),
-                "manufacturer": dev.get("manufacturer"),
-                "model": dev.get("model"),
-                "last_sync": dev.get("lastSyncDateTime"),
-                "management_state": dev.get("managementState"),
-                "outcome": outcome.value,
-                "synced_at": datetime.now(tz=timezone.utc).isoformat(),
-            }
-
-    if config.sync_state_file and config.lifecycle_reconciliation:
+        if not serial or state_store is None:
+            return
+        current_intune_serials.add(serial)
+        previous = previous_state.get(serial)
+        entry = _sync_state_entry(
+            dev, outcome, previous if isinstance(previous, dict) else None
+        )
+        if dev.get("id") in primary_upns:
+            entry["primary_upn"] = primary_upns[dev["id"]]
+        if "_enrichment" in dev:
+            entry["enrichment"] = dev["_enrichment"]
+        sync_state[serial] = entry
+        state_store.record(serial, entry)
+        if outcome.value not in FAILED_OUTCOMES:
+            completed[serial] = outcome.value
+        if not checkpointing:
+            return
+        if stop_requested.is_set():
+            _write_checkpoint()
+            raise SystemExit(128 + signal.SIGTERM)
+        recorded += 1
+        if config.checkpoint_interval and recorded % config.checkpoint_interval == 0:
+            _write_checkpoint()
+
+    previous_sigterm = None
+    if checkpointing:
+        previous_sigterm = signal.signal(
+            signal.SIGTERM, lambda _signum, _frame: stop_requested.set()
+        )
+    try:
+        run_device_sync(
+            pending_devices, _sync_one, workers=config.workers, on_result=_record
+        )
+    except Exception:
+        if checkpointing and completed:
+            _write_checkpoint()
+        raise
+    finally:
+        if previous_sigterm is not None:
+            signal.signal(signal.SIGTERM, previous_sigterm)
+
+    if since is not None:
+        # Incremental run: devices not re-listed keep their previous entries.
+        for serial, entry in _state_entries(previous_state):
+            sync_state.setdefault(serial, entry)
+    elif config.sync_state_file and config.lifecycle_reconciliation:
         recon_counts = reconcile_missing_devices(
             snipe,
             config,
@@ -2022,11 +4304,38 @@ def main() -> None:
             default_status_id=default_status_id,
             status_ids=lifecycle_status_ids,
             dry_run=args.dry_run,
+            sync_state=sync_state,
         )
         for outcome, n in recon_counts.items():
             counts[outcome] += n
 
-    save_sync_state(config.sync_state_file, sync_state)
+    if config.sync_state_file:
+        if args.dry_run:
+            meta = _state_meta(previous_state)
+        else:
+            failed_devices = [
+                dev
+                for dev in devices
+                if (sync_state.get(dev.get("serialNumber") or "") or {}).get("outcome")
+                in FAILED_OUTCOMES
+            ]
+            meta = _updated_state_meta(
+                previous_state,
+                scope_key,
+                devices,
+                full_sweep=since is None,
+                now=run_started,
+                group_members=(group_members or {}).get("ids"),
+                failed_devices=failed_devices,
+            )
+            if group_delta_state is not None:
+                meta["group_delta"] = group_delta_state
+        if meta:
+            sync_state[SYNC_STATE_META_KEY] = meta
+
+    if state_store is not None:
+        state_store.save(sync_state, platform=args.platform, scope_key=scope_key)
+        state_store.close()
     log.info("%s", _format_summary(counts, args.dry_run))
 
 
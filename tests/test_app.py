@@ -3,34 +3,68 @@
 from __future__ import annotations
 
 import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
 from unittest.mock import MagicMock, patch
 
 import pytest
 import requests
+from msal import SerializableTokenCache
 
 from app import (
+    LIFECYCLE_MAX_ATTEMPTS,
+    GraphCancelled,
     GraphClient,
+    LocationPrefixIndex,
     SnipeITClient,
+    StartupError,
+    JsonSyncStateStore,
+    SqliteSyncStateStore,
     SyncConfig,
     SyncOutcome,
+    _asset_payload_changes,
     _assigned_user_id,
+    _cached_enrichment,
+    _checkpoint_state,
+    _cached_primary_upns,
+    _merge_sync_state,
+    _custom_field_payload,
     _autopilot_pending,
     _build_asset_payload,
+    _timed,
     _device_in_retire_state,
     _device_user_upn,
     _enrich_device_autopilot,
+    _device_fingerprint,
+    _enrichment_fields,
     _env_status_name,
+    _fingerprint_unchanged,
     _format_summary,
+    _graph_datetime,
+    _http_session,
+    _incremental_since,
+    _managed_device_select,
     _managed_devices_url,
     _parse_group_ids,
     _parse_graph_datetime,
     _platform_includes_windows,
+    _resume_checkpoint,
+    _run_startup_phases,
+    _sync_scope,
     _status_unavailable,
+    _sync_state_entry,
+    _updated_state_meta,
     _upn_location_prefix,
+    bootstrap_snipe,
     fetch_group_device_ids,
     fetch_managed_devices,
+    load_sync_state,
+    main,
     normalize_upn,
+    prepare_taxonomy,
     reconcile_missing_devices,
+    save_sync_state,
+    run_device_sync,
     sync_device,
 )
 
@@ -46,6 +80,81 @@ def _test_config(**kwargs: object) -> SyncConfig:
     return SyncConfig(**defaults)  # type: ignore[arg-type]
 
 
+class TestStartupPhases:
+    def test_timed_returns_result_and_logs(self, caplog: pytest.LogCaptureFixture) -> None:
+        with caplog.at_level("INFO", logger="intune2snipe"):
+            assert _timed("demo", lambda x: x * 2, 21) == 42
+        assert "Startup phase 'demo' took" in caplog.text
+
+    def test_bootstrap_returns_ids_and_runs_preloads(self) -> None:
+        snipe = MagicMock()
+        snipe.get_or_create_category.return_value = 7
+        snipe.get_or_create_status_id.return_value = 3
+        config = _test_config(preload_assets=True)
+        category_id, status_id, lifecycle = bootstrap_snipe(snipe, config, dry_run=False)
+        assert (category_id, status_id) == (7, 3)
+        assert lifecycle == {"pending_retire": 3}
+        assert snipe._checkout_status_id == 3
+        snipe.preload_asset_index.assert_called_once()
+
+    def test_failing_phase_returns_while_another_is_paging(self) -> None:
+        import time as _time
+
+        def paging() -> None:
+            for _page in range(30):
+                _time.sleep(0.1)
+
+        def failing() -> None:
+            raise StartupError("missing label")
+
+        cancelled = MagicMock()
+        started = _time.monotonic()
+        with pytest.raises(StartupError):
+            _run_startup_phases([("devices", paging), ("snipe", failing)], on_failure=cancelled)
+        assert _time.monotonic() - started < 1
+        cancelled.assert_called_once()
+
+    def test_process_exit_does_not_wait_for_running_phase(self) -> None:
+        import subprocess
+        import sys
+        import time as _time
+
+        script = (
+            "import sys, time\n"
+            "from app import StartupError, _run_startup_phases\n"
+            "def fail():\n"
+            "    raise StartupError('x')\n"
+            "try:\n"
+            "    _run_startup_phases([('slow', lambda: time.sleep(10)), ('fail', fail)],\n"
+            "                        on_failure=lambda: None)\n"
+            "except StartupError:\n"
+            "    sys.exit(1)\n"
+        )
+        started = _time.monotonic()
+        proc = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+        )
+        assert proc.returncode == 1
+        assert _time.monotonic() - started < 5
+
+    def test_cancelled_graph_refuses_requests(self) -> None:
+        graph = GraphClient()
+        graph._session = MagicMock()
+        graph.cancel()
+        with pytest.raises(GraphCancelled):
+            list(graph.iter_paginated("https://graph.microsoft.com/v1.0/x"))
+        graph._session.request.assert_not_called()
+
+    def test_bootstrap_raises_without_default_status(self) -> None:
+        snipe = MagicMock()
+        snipe.get_or_create_status_id.return_value = None
+        config = _test_config(auto_create_default_status=False)
+        with pytest.raises(StartupError):
+            bootstrap_snipe(snipe, config, dry_run=False)
+
+
 class TestNormalizeUpn:
     def test_none(self) -> None:
         assert normalize_upn(None) is None
@@ -71,29 +180,112 @@ class TestFetchGroupDeviceIds:
     def test_no_groups_returns_none(self) -> None:
         g = MagicMock()
         assert fetch_group_device_ids(g, []) is None
-        g.get_paginated.assert_not_called()
+        g.iter_paginated.assert_not_called()
 
     def test_collects_device_ids(self) -> None:
         g = MagicMock()
-        g.get_paginated.return_value = [{"id": "d1"}, {"id": "d2"}]
+        g.batch.return_value = {
+            "g1": {"status": 200, "body": {"value": [{"id": "d1"}, {"id": "d2"}]}}
+        }
         out = fetch_group_device_ids(g, ["g1"])
         assert out == {"d1", "d2"}
-        g.get_paginated.assert_called_once()
-        assert "groups/g1" in g.get_paginated.call_args[0][0]
-        assert "microsoft.graph.device" in g.get_paginated.call_args[0][0]
+        g.batch.assert_called_once()
+        url = g.batch.call_args[0][0][0]["url"]
+        assert "groups/g1" in url
+        assert "microsoft.graph.device" in url
+        g.iter_paginated.assert_not_called()
 
     def test_403_raises_runtime_error(self) -> None:
         g = MagicMock()
+        g.batch.return_value = {"g1": {"status": 403, "body": {}}}
+        with pytest.raises(RuntimeError, match="403 Forbidden"):
+            fetch_group_device_ids(g, ["g1"])
+
+    def test_403_on_later_page_raises_runtime_error(self) -> None:
+        g = MagicMock()
+        g.batch.return_value = {
+            "g1": {"status": 200, "body": {"value": [], "@odata.nextLink": "https://n"}}
+        }
 
         def boom(_url: str) -> list[dict]:
             resp = requests.Response()
             resp.status_code = 403
             raise requests.HTTPError(response=resp)
 
-        g.get_paginated.side_effect = boom
+        g.iter_paginated.side_effect = boom
         with pytest.raises(RuntimeError, match="403 Forbidden"):
             fetch_group_device_ids(g, ["g1"])
 
+    def test_delta_applies_adds_and_removes(self) -> None:
+        g = MagicMock()
+        g.get_delta.return_value = (
+            [
+                {
+                    "id": "g1",
+                    "members@delta": [
+                        {"@odata.type": "#microsoft.graph.device", "id": "d3"},
+                        {"@odata.type": "#microsoft.graph.user", "id": "u1"},
+                        {"@odata.type": "#microsoft.graph.device", "id": "d1", "@removed": {}},
+                    ],
+                }
+            ],
+            "https://delta/2",
+        )
+        state = {"g1": {"delta_link": "https://delta/1", "members": ["d1", "d2"]}}
+        out = fetch_group_device_ids(g, ["g1"], delta_state=state)
+        assert out == {"d2", "d3"}
+        g.get_delta.assert_called_once_with("https://delta/1")
+        assert state["g1"] == {"delta_link": "https://delta/2", "members": ["d2", "d3"]}
+        g.batch.assert_not_called()
+
+    def test_delta_expired_token_reenumerates(self) -> None:
+        g = MagicMock()
+        gone = requests.Response()
+        gone.status_code = 410
+        g.get_delta.side_effect = [
+            requests.HTTPError(response=gone),
+            (
+                [{"id": "g1", "members@delta": [
+                    {"@odata.type": "#microsoft.graph.device", "id": "d9"}
+                ]}],
+                "https://delta/new",
+            ),
+        ]
+        state = {"g1": {"delta_link": "https://delta/old", "members": ["d1"]}}
+        out = fetch_group_device_ids(g, ["g1"], delta_state=state)
+        assert out == {"d9"}
+        assert "groups/delta" in g.get_delta.call_args_list[1][0][0]
+        assert state["g1"]["delta_link"] == "https://delta/new"
+
+    def test_follows_pages_in_parallel_and_dedupes(self) -> None:
+        g = MagicMock()
+        g.batch.return_value = {
+            "g1": {
+                "status": 200,
+                "body": {"value": [{"id": "d1"}], "@odata.nextLink": "https://next/g1"},
+            },
+            "g2": {
+                "status": 200,
+                "body": {"value": [{"id": "d1"}], "@odata.nextLink": "https://next/g2"},
+            },
+            "g3": {"status": 404, "body": {}},
+        }
+        g.iter_paginated.side_effect = lambda url: iter(
+            [{"id": "d2"}] if url.endswith("g1") else [{"id": "d3"}]
+        )
+        out = fetch_group_device_ids(g, ["g1", "g2", "g3", "g1"], max_workers=2)
+        assert out == {"d1", "d2", "d3"}
+        assert len(g.batch.call_args[0][0]) == 3
+        assert g.iter_paginated.call_count == 2
+
+    def test_transitive_members(self) -> None:
+        g = MagicMock()
+        g.batch.return_value = {"g1": {"status": 200, "body": {"value": []}}}
+        fetch_group_device_ids(g, ["g1"], transitive=True)
+        assert "/groups/g1/transitiveMembers/microsoft.graph.device" in (
+            g.batch.call_args[0][0][0]["url"]
+        )
+
 
 class TestManagedDevicesUrl:
     def test_select_and_filter_windows(self) -> None:
@@ -109,6 +301,384 @@ class TestManagedDevicesUrl:
         assert "%24filter=" not in url and "$filter=" not in url
 
 
+class TestStreamingManagedDevices:
+    def test_iter_paginated_follows_next_link_lazily(self) -> None:
+        with patch.dict(
+            os.environ,
+            {"AZURE_TENANT_ID": "t", "AZURE_CLIENT_ID": "c", "AZURE_CLIENT_SECRET": "s"},
+            clear=False,
+        ):
+            gc = GraphClient()
+            pages = [
+                {"value": [{"id": "a"}], "@odata.nextLink": "https://next"},
+                {"value": [{"id": "b"}]},
+            ]
+            gc._request = MagicMock(  # type: ignore[method-assign]
+                side_effect=[MagicMock(json=MagicMock(return_value=p)) for p in pages]
+            )
+            it = gc.iter_paginated("https://first")
+            assert next(it) == {"id": "a"}
+            assert gc._request.call_count == 1
+            assert list(it) == [{"id": "b"}]
+            assert gc._request.call_args[0][1] == "https://next"
+
+    def test_filters_applied_while_streaming(self) -> None:
+        g = MagicMock()
+        g.iter_paginated.side_effect = lambda url: iter([
+            {"id": "1", "operatingSystem": "Windows", "azureADDeviceId": "aad-1"},
+            {"id": "2", "operatingSystem": "iOS", "azureADDeviceId": "aad-2"},
+            {"id": "3", "operatingSystem": "Windows", "azureADDeviceId": "aad-3"},
+        ])
+        g.get_count.return_value = None
+        with patch("app.fetch_group_device_ids", return_value={"aad-1", "aad-2"}):
+            devices = fetch_managed_devices(g, "windows", group_ids=["g1"])
+        assert [d["id"] for d in devices] == ["1"]
+
+
+class TestManagedDeviceSelect:
+    def test_base_fields_only_without_custom_fields(self) -> None:
+        fields = _managed_device_select({}).split(",")
+        assert "serialNumber" in fields and "managementState" in fields
+        assert "imei" not in fields
+
+    def test_adds_mapped_keys_once(self) -> None:
+        select = _managed_device_select({
+            "totalStorageSpaceInBytes": "_snipeit_storage_1",
+            "osVersion": "_snipeit_os_2",
+            "_autopilot_enrollmentState": "_snipeit_ap_3",
+        })
+        fields = select.split(",")
+        assert fields[-1] == "totalStorageSpaceInBytes"
+        assert fields.count("osVersion") == 1
+        assert "_autopilot_enrollmentState" not in fields
+
+    def test_unknown_key_not_selected(self) -> None:
+        select = _managed_device_select({
+            "serialNumbr": "_snipeit_typo_1",
+            "skuFamily.name": "_snipeit_beta_2",
+            "enrolledDateTime": "_snipeit_enrolled_3",
+        })
+        fields = select.split(",")
+        assert "serialNumbr" not in fields
+        assert "skuFamily" not in fields
+        assert fields[-1] == "enrolledDateTime"
+
+    def test_listing_uses_dynamic_select(self) -> None:
+        g = MagicMock()
+        g.iter_paginated.return_value = iter([])
+        config = _test_config(custom_fields={"enrolledDateTime": "_snipeit_enrolled_4"})
+        fetch_managed_devices(g, "windows", config=config)
+        assert "enrolledDateTime" in g.iter_paginated.call_args[0][0]
+
+
+class TestDeviceEnrichment:
+    _CF = {
+        "hardwareInformation.tpmVersion": "_snipeit_tpm_1",
+        "physicalMemoryInBytes": "_snipeit_ram_2",
+        "osVersion": "_snipeit_os_3",
+    }
+
+    def test_detail_only_fields_split_from_select(self) -> None:
+        assert _enrichment_fields(self._CF) == ["hardwareInformation", "physicalMemoryInBytes"]
+        fields = _managed_device_select(self._CF).split(",")
+        assert "hardwareInformation" not in fields
+        assert "physicalMemoryInBytes" not in fields
+
+    def test_dotted_custom_field_reads_nested_value(self) -> None:
+        dev = {"hardwareInformation": {"tpmVersion": "2.0"}, "physicalMemoryInBytes": 16}
+        payload = _custom_field_payload(dev, _test_config(custom_fields=self._CF))
+        assert payload == {"_snipeit_tpm_1": "2.0", "_snipeit_ram_2": 16}
+
+    def test_cache_reused_until_device_resyncs(self) -> None:
+        fields = ["physicalMemoryInBytes"]
+        state = {
+            "SN1": {"intune_id": "d1", "last_sync": "t1", "enrichment": {"physicalMemoryInBytes": 8}},
+            "SN2": {"intune_id": "d2", "last_sync": "t1", "enrichment": {"physicalMemoryInBytes": 8}},
+        }
+        devices = [
+            {"id": "d1", "serialNumber": "SN1", "lastSyncDateTime": "t1"},
+            {"id": "d2", "serialNumber": "SN2", "lastSyncDateTime": "t2"},
+            {"id": "d3", "serialNumber": "SN3", "lastSyncDateTime": "t1"},
+        ]
+        cached, missing = _cached_enrichment(devices, state, fields)
+        assert cached == {"d1": {"physicalMemoryInBytes": 8}}
+        assert missing == ["d2", "d3"]
+
+    def test_fetch_device_details_uses_batch(self) -> None:
+        with patch.dict(
+            os.environ,
+            {"AZURE_TENANT_ID": "t", "AZURE_CLIENT_ID": "c", "AZURE_CLIENT_SECRET": "s"},
+            clear=False,
+        ):
+            gc = GraphClient()
+        gc.batch = MagicMock(return_value={  # type: ignore[method-assign]
+            "d1": {"status": 200, "body": {"physicalMemoryInBytes": 8, "id": "d1"}},
+            "d2": {"status": 404, "body": {}},
+        })
+        out = gc.fetch_device_details(["d1", "d2"], ["physicalMemoryInBytes"])
+        assert out == {"d1": {"physicalMemoryInBytes": 8}}
+        req = gc.batch.call_args[0][0][0]
+        assert req["url"] == "/deviceManagement/managedDevices/d1?%24select=physicalMemoryInBytes"
+        assert gc.batch.call_args[1]["api_version"] == "beta"
+
+
+class TestParallelPlatforms:
+    def test_splits_listing_per_os_and_dedupes(self) -> None:
+        g = MagicMock()
+        by_os = {
+            "Windows": [{"id": "1", "operatingSystem": "Windows"}],
+            "iOS": [{"id": "2", "operatingSystem": "iOS"}],
+        }
+
+        def pages(url: str) -> Iterator[dict]:
+            if "+ne+" in url:
+                return iter([
+                    {"id": "9", "operatingSystem": "Linux"},
+                    {"id": "1", "operatingSystem": "Windows"},
+                ])
+            for os_name, devs in by_os.items():
+                if f"operatingSystem+eq+'{os_name}'" in url:
+                    return iter(devs)
+            return iter([])
+
+        g.iter_paginated.side_effect = pages
+        config = _test_config(parallel_platforms=True)
+        devices = fetch_managed_devices(g, "all", config=config)
+        assert [d["id"] for d in devices] == ["1", "2", "9"]
+        assert g.iter_paginated.call_count == 5
+
+    def test_disabled_uses_single_listing(self) -> None:
+        g = MagicMock()
+        g.iter_paginated.return_value = iter([{"id": "1", "operatingSystem": "Linux"}])
+        devices = fetch_managed_devices(g, "all", config=_test_config())
+        assert [d["id"] for d in devices] == ["1"]
+        g.iter_paginated.assert_called_once()
+
+
+class TestGroupDeviceIdFilter:
+    _CONFIG = _test_config(group_filter_ratio=0.05)
+
+    def test_small_group_queries_by_device_id(self) -> None:
+        g = MagicMock()
+        g.get_count.return_value = 1000
+        g.batch.return_value = {
+            "0": {"status": 200, "body": {"value": [
+                {"id": "1", "operatingSystem": "Windows", "azureADDeviceId": "aad-1"},
+            ]}},
+        }
+        with patch("app.fetch_group_device_ids", return_value={"aad-1", "aad-2"}):
+            devices = fetch_managed_devices(
+                g, "windows", group_ids=["g1"], config=self._CONFIG
+            )
+        assert [d["id"] for d in devices] == ["1"]
+        g.iter_paginated.assert_not_called()
+        url = g.batch.call_args[0][0][0]["url"]
+        assert url.startswith("/deviceManagement/managedDevices?")
+        assert "azureADDeviceId+eq+'aad-1'+or+azureADDeviceId+eq+'aad-2'" in url
+
+    def test_large_group_lists_all_devices(self) -> None:
+        g = MagicMock()
+        g.get_count.return_value = 20
+        g.iter_paginated.side_effect = lambda url: iter([
+            {"id": "1", "operatingSystem": "Windows", "azureADDeviceId": "aad-1"},
+        ])
+        with patch("app.fetch_group_device_ids", return_value={"aad-1", "aad-2"}):
+            devices = fetch_managed_devices(
+                g, "windows", group_ids=["g1"], config=self._CONFIG
+            )
+        assert [d["id"] for d in devices] == ["1"]
+        g.batch.assert_not_called()
+
+    def test_failed_lookup_falls_back_to_listing(self) -> None:
+        g = MagicMock()
+        g.get_count.return_value = 1000
+        g.batch.return_value = {"0": {"status": 400, "body": {}}}
+        g.iter_paginated.side_effect = lambda url: iter([
+            {"id": "1", "operatingSystem": "Windows", "azureADDeviceId": "aad-1"},
+        ])
+        with patch("app.fetch_group_device_ids", return_value={"aad-1"}):
+            devices = fetch_managed_devices(
+                g, "windows", group_ids=["g1"], config=self._CONFIG
+            )
+        assert [d["id"] for d in devices] == ["1"]
+        g.iter_paginated.assert_called_once()
+
+    def test_failed_next_page_falls_back_to_listing(self) -> None:
+        g = MagicMock()
+        g.get_count.return_value = 1000
+        g.batch.return_value = {
+            "0": {"status": 200, "body": {"value": [], "@odata.nextLink": "https://next"}},
+        }
+
+        def pages(url: str) -> Iterator[dict]:
+            if url == "https://next":
+                raise requests.exceptions.HTTPError("503")
+            return iter([{"id": "1", "operatingSystem": "Windows", "azureADDeviceId": "aad-1"}])
+
+        g.iter_paginated.side_effect = pages
+        with patch("app.fetch_group_device_ids", return_value={"aad-1"}):
+            devices = fetch_managed_devices(
+                g, "windows", group_ids=["g1"], config=self._CONFIG
+            )
+        assert [d["id"] for d in devices] == ["1"]
+
+    def test_filter_is_off_by_default(self) -> None:
+        g = MagicMock()
+        g.iter_paginated.side_effect = lambda url: iter([])
+        with patch("app.fetch_group_device_ids", return_value={"aad-1"}):
+            fetch_managed_devices(g, "windows", group_ids=["g1"])
+        g.get_count.assert_not_called()
+        g.batch.assert_not_called()
+
+
+class TestIncrementalSync:
+    _NOW = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+    def _state(self, **scope: str) -> dict:
+        return {"SN1": {"platform": "windows"}, "_intune2snipe": {"scopes": {"all": scope}}}
+
+    def test_url_adds_last_sync_filter(self) -> None:
+        url = _managed_devices_url("windows", datetime(2024, 3, 1, 10, 0, tzinfo=timezone.utc))
+        assert "lastSyncDateTime+ge+2024-03-01T10%3A00%3A00Z" in url
+        assert "operatingSystem+eq+'Windows'+and+" in url
+
+    def test_since_is_watermark_minus_skew(self) -> None:
+        config = _test_config(sync_state_file="/tmp/s.json", incremental_sync=True)
+        state = self._state(
+            watermark="2024-03-01T11:00:00Z", last_full_sync="2024-03-01T00:00:00Z"
+        )
+        since = _incremental_since(state, "all", config, self._NOW)
+        assert since == datetime(2024, 3, 1, 10, 45, tzinfo=timezone.utc)
+
+    def test_full_sweep_when_due_or_no_watermark(self) -> None:
+        config = _test_config(sync_state_file="/tmp/s.json", incremental_sync=True)
+        stale_full = self._state(
+            watermark="2024-03-01T11:00:00Z", last_full_sync="2024-02-28T00:00:00Z"
+        )
+        assert _incremental_since(stale_full, "all", config, self._NOW) is None
+        assert _incremental_since(self._state(), "all", config, self._NOW) is None
+        assert _incremental_since(
+            stale_full, "all", _test_config(sync_state_file="/tmp/s.json"), self._NOW
+        ) is None
+
+    def test_meta_advances_watermark_per_platform(self) -> None:
+        state = self._state(watermark="2024-02-01T00:00:00Z", last_full_sync="2024-02-01T00:00:00Z")
+        meta = _updated_state_meta(
+            state,
+            "windows",
+            [{"lastSyncDateTime": "2024-02-27T08:00:00Z"}, {"lastSyncDateTime": None}],
+            full_sweep=True,
+            now=self._NOW,
+        )
+        assert meta["scopes"]["windows"] == {
+            "watermark": "2024-02-27T08:00:00Z",
+            "last_full_sync": "2024-03-01T12:00:00Z",
+        }
+        assert meta["scopes"]["all"]["watermark"] == "2024-02-01T00:00:00Z"
+
+    def test_watermark_stops_at_earliest_failed_device(self) -> None:
+        failed = {"serialNumber": "SN2", "lastSyncDateTime": "2024-02-20T08:00:00Z"}
+        meta = _updated_state_meta(
+            self._state(watermark="2024-02-01T00:00:00Z"),
+            "all",
+            [{"lastSyncDateTime": "2024-02-27T08:00:00Z"}, failed],
+            full_sweep=False,
+            now=self._NOW,
+            failed_devices=[failed],
+        )
+        assert meta["scopes"]["all"]["watermark"] == "2024-02-20T08:00:00Z"
+
+    def test_group_runs_get_their_own_scope(self) -> None:
+        assert _sync_scope("windows", None) == "windows"
+        scope = _sync_scope("windows", ["g2", "g1"])
+        assert scope.startswith("windows:groups:")
+        assert scope == _sync_scope("windows", ["g1", "g2"])
+        assert scope != _sync_scope("windows", ["g1"])
+
+    def test_new_group_members_listed_without_since(self) -> None:
+        g = MagicMock()
+        g.iter_paginated.side_effect = lambda url: iter([
+            {"id": "1", "operatingSystem": "Windows", "azureADDeviceId": "aad-1"},
+        ])
+        g.batch.return_value = {
+            "0": {"status": 200, "body": {"value": [
+                {"id": "2", "operatingSystem": "Windows", "azureADDeviceId": "aad-2"},
+            ]}},
+        }
+        members: dict = {"ids": ["aad-1"]}
+        with patch("app.fetch_group_device_ids", return_value={"aad-1", "aad-2"}):
+            devices = fetch_managed_devices(
+                g, "windows", group_ids=["g1"], since=self._NOW, group_members=members
+            )
+        assert [d["id"] for d in devices] == ["1", "2"]
+        assert "lastSyncDateTime+ge" in g.iter_paginated.call_args[0][0]
+        url = g.batch.call_args[0][0][0]["url"]
+        assert "azureADDeviceId+eq+'aad-2'" in url
+        assert "lastSyncDateTime+ge" not in url
+        assert members == {"ids": ["aad-1", "aad-2"]}
+
+    def test_merge_keeps_other_scopes_of_platform(self) -> None:
+        on_disk = {"_intune2snipe": {"scopes": {"windows": {"watermark": "a"}}}}
+        run = {"_intune2snipe": {"scopes": {"windows:groups:x": {"watermark": "b"}}}}
+        merged = _merge_sync_state(on_disk, run, "windows", "windows:groups:x")
+        assert merged["_intune2snipe"]["scopes"] == {
+            "windows": {"watermark": "a"},
+            "windows:groups:x": {"watermark": "b"},
+        }
+
+    def test_reconcile_ignores_meta_key(self) -> None:
+        snipe = MagicMock()
+        config = _test_config(sync_state_file="/tmp/state.json")
+        counts = reconcile_missing_devices(
+            snipe,
+            config,
+            {"_intune2snipe": {"scopes": {}}},
+            current_intune_serials=set(),
+            autopilot_by_serial={},
+            platform="all",
+            default_status_id=2,
+            status_ids={},
+            dry_run=False,
+        )
+        assert sum(counts.values()) == 0
+        snipe.ensure_asset_for_sync.assert_not_called()
+
+
+class TestDeviceFingerprint:
+    _NOW = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+    _DEV = {
+        "deviceName": "pc",
+        "serialNumber": "SN1",
+        "model": "XPS",
+        "osVersion": "11",
+        "lastSyncDateTime": "2024-03-01T10:00:00Z",
+    }
+
+    def test_ignores_volatile_fields_under_stable_notes(self) -> None:
+        config = _test_config()
+        a = _device_fingerprint(self._DEV, "u@d.com", None, config)
+        b = _device_fingerprint(
+            {**self._DEV, "lastSyncDateTime": "2024-03-02T10:00:00Z"}, "u@d.com", None, config
+        )
+        assert a == b
+        assert a != _device_fingerprint({**self._DEV, "osVersion": "12"}, "u@d.com", None, config)
+        assert a != _device_fingerprint(self._DEV, "other@d.com", None, config)
+        assert a != _device_fingerprint(
+            self._DEV, "u@d.com", None, _test_config(custom_fields={"imei": "imei"})
+        )
+
+    def test_skip_requires_success_and_recent_verification(self) -> None:
+        config = _test_config(force_refresh_hours=24)
+        entry = {"fingerprint": "f", "outcome": "updated", "verified_at": "2024-03-01T00:00:00+00:00"}
+        assert _fingerprint_unchanged(entry, "f", config, self._NOW)
+        assert not _fingerprint_unchanged(entry, "g", config, self._NOW)
+        assert not _fingerprint_unchanged({**entry, "outcome": "update_failed"}, "f", config, self._NOW)
+        assert not _fingerprint_unchanged(
+            {**entry, "verified_at": "2024-02-27T00:00:00+00:00"}, "f", config, self._NOW
+        )
+        assert not _fingerprint_unchanged(None, "f", config, self._NOW)
+
+
 class TestDeviceUserUpn:
     def test_primary_user_when_enabled(self) -> None:
         config = _test_config(use_primary_user=True)
@@ -160,6 +730,72 @@ class TestFindAssetBySerial:
             assert c.find_asset_by_serial("NEW-SERIAL") is None
 
 
+class TestAssetSerialIndex:
+    _SNIPE_ENV = {
+        "SNIPEIT_URL": "https://snipe.example.com/api/v1",
+        "SNIPEIT_API_TOKEN": "token",
+    }
+
+    def _client(self, pages: dict[str | None, list[dict]]) -> SnipeITClient:
+        c = SnipeITClient(_test_config())
+
+        def rows(path: str, params: dict | None = None):  # type: ignore[no-untyped-def]
+            assert path == "/hardware"
+            return iter(pages.get((params or {}).get("status"), []))
+
+        c._iter_rows = MagicMock(side_effect=rows)  # type: ignore[method-assign]
+        c._session = MagicMock()
+        return c
+
+    def test_lookup_answers_from_index_without_byserial(self) -> None:
+        with patch.dict(os.environ, self._SNIPE_ENV, clear=False):
+            c = self._client({
+                None: [{"id": 1, "serial": "ABC"}],
+                "Archived": [{"id": 2, "serial": "ARCH"}],
+                "Deleted": [
+                    {"id": 3, "serial": "gone", "deleted_at": "2024-01-01"},
+                    {"id": 9, "serial": "abc", "deleted_at": "2024-01-01"},
+                ],
+            })
+            assert c.preload_asset_index() == 3
+            assert c.find_asset_by_serial(" abc ")["id"] == 1
+            assert c.find_asset_by_serial("arch")["id"] == 2
+            assert c.find_asset_by_serial("GONE") is None
+            assert c.find_asset_by_serial("GONE", include_deleted=True)["id"] == 3
+            assert c.find_asset_by_serial("missing") is None
+            c._session.get.assert_not_called()
+
+    def test_create_and_restore_update_index(self) -> None:
+        with patch.dict(os.environ, self._SNIPE_ENV, clear=False):
+            c = self._client({
+                "Deleted": [{"id": 3, "serial": "SN3", "deleted_at": "2024-01-01"}],
+            })
+            c.preload_asset_index()
+            c._post = MagicMock(  # type: ignore[method-assign]
+                return_value={"status": "success", "payload": {"id": 7, "serial": "SN7"}}
+            )
+            c.create_asset({"serial": "SN7"})
+            assert c.find_asset_by_serial("sn7") == {"id": 7, "serial": "SN7"}
+            restored = c.ensure_asset_for_sync(
+                "SN3", config=_test_config(restore_deleted_assets=True)
+            )
+            assert restored is not None and restored["id"] == 3
+            assert c.find_asset_by_serial("SN3")["id"] == 3
+            c._session.get.assert_not_called()
+
+    def test_html_escaped_serials_share_key_with_raw(self) -> None:
+        with patch.dict(os.environ, self._SNIPE_ENV, clear=False):
+            c = self._client({None: [{"id": 1, "serial": "R&amp;D-&#039;01"}]})
+            c.preload_asset_index()
+            assert c.find_asset_by_serial("R&D-'01")["id"] == 1
+            c._post = MagicMock(  # type: ignore[method-assign]
+                return_value={"status": "success", "payload": {"id": 2, "serial": "A&B"}}
+            )
+            c.create_asset({"serial": "A&B"})
+            assert c.find_asset_by_serial("a&b")["id"] == 2
+            c._session.get.assert_not_called()
+
+
 class TestSnipeTaxonomyLookup:
     def test_manufacturer_case_insensitive_match(self) -> None:
         with patch.dict(
@@ -197,6 +833,57 @@ class TestSnipeTaxonomyLookup:
             c._session.post.assert_not_called()
 
 
+class TestTaxonomyPreload:
+    _SNIPE_ENV = {
+        "SNIPEIT_URL": "https://snipe.example.com/api/v1",
+        "SNIPEIT_API_TOKEN": "token",
+    }
+
+    def _client(self) -> SnipeITClient:
+        c = SnipeITClient(_test_config())
+        rows = {
+            "/categories": [{"id": 1, "name": "Intune"}],
+            "/manufacturers": [{"id": 5, "name": "Lenovo"}],
+            "/models": [
+                {"id": 7, "name": "ThinkPad X1", "model_number": "20XW"},
+                {"id": 8, "name": "20XW", "model_number": "OTHER"},
+            ],
+        }
+        c._iter_rows = MagicMock(  # type: ignore[method-assign]
+            side_effect=lambda path, params=None: iter(rows[path])
+        )
+        c.preload_taxonomy()
+        c._iter_rows.reset_mock()
+        return c
+
+    def test_lookups_use_preloaded_indexes(self) -> None:
+        with patch.dict(os.environ, self._SNIPE_ENV, clear=False):
+            c = self._client()
+            assert c.get_or_create_category("intune") == 1
+            assert c.get_or_create_manufacturer("LENOVO") == 5
+            assert c.get_or_create_model("20xw", 5, 1) == 7
+            assert c.get_or_create_model("thinkpad x1", 5, 1) == 7
+            c._iter_rows.assert_not_called()
+
+    def test_prepare_taxonomy_creates_missing_pairs_once(self) -> None:
+        with patch.dict(os.environ, self._SNIPE_ENV, clear=False):
+            c = self._client()
+            c._post = MagicMock(  # type: ignore[method-assign]
+                return_value={"payload": {"id": 42}}
+            )
+            devices = [
+                {"serialNumber": "A", "manufacturer": "Lenovo", "model": "NEW1"},
+                {"serialNumber": "B", "manufacturer": "Lenovo", "model": "NEW1"},
+                {"serialNumber": "C", "manufacturer": "Lenovo", "model": "RET",
+                 "managementState": "retirePending"},
+            ]
+            assert prepare_taxonomy(c, devices, 1, _test_config()) == 1
+            c._post.assert_called_once()
+            assert c._post.call_args[0][0] == "/models"
+            assert c.get_or_create_model("new1", 5, 1) == 42
+            c._iter_rows.assert_not_called()
+
+
 class TestSnipeGetUserId:
     def test_email_exact_match(self) -> None:
         with patch.dict(
@@ -235,6 +922,41 @@ class TestSnipeGetUserId:
             assert c.get_user_id("jdoe") == 7
 
 
+class TestSnipeUserIndex:
+    _SNIPE_ENV = {
+        "SNIPEIT_URL": "https://snipe.example.com/api/v1",
+        "SNIPEIT_API_TOKEN": "token",
+    }
+
+    def test_answers_from_snapshot(self) -> None:
+        with patch.dict(os.environ, self._SNIPE_ENV, clear=False):
+            c = SnipeITClient(_test_config())
+            c._iter_rows = MagicMock(  # type: ignore[method-assign]
+                return_value=iter([
+                    {"id": 1, "email": "User@Domain.com", "username": "user"},
+                    {"id": 2, "email": "", "username": "JDOE"},
+                ])
+            )
+            assert c.preload_user_index() == 2
+            assert c.get_user_id("user@domain.com") == 1
+            assert c.get_user_id("jdoe") == 2
+            c._iter_rows.assert_called_once_with("/users")
+
+    def test_falls_back_to_search_for_missing_upn(self) -> None:
+        with patch.dict(os.environ, self._SNIPE_ENV, clear=False):
+            c = SnipeITClient(_test_config())
+            c._iter_rows = MagicMock(return_value=iter([]))  # type: ignore[method-assign]
+            c.preload_user_index()
+            c._iter_rows = MagicMock(  # type: ignore[method-assign]
+                return_value=iter([{"id": 9, "email": "new@domain.com"}])
+            )
+            assert c.get_user_id("new@domain.com") == 9
+            assert c._iter_rows.call_args_list[0][0] == (
+                "/users",
+                {"email": "new@domain.com"},
+            )
+
+
 class TestBuildAssetPayload:
     def test_create_includes_checkout_on_create(self) -> None:
         config = _test_config(checkout_on_create=True)
@@ -336,6 +1058,51 @@ class TestSnipeLocationCheckout:
             c._session.get.return_value.raise_for_status = MagicMock()
             assert c.get_location_id("A55@domain.com", prefix_len=3) == 9
 
+    def test_prefix_index_first_loaded_location_wins(self) -> None:
+        index = LocationPrefixIndex()
+        index.add("A55 - North", 1)
+        index.add("A55 - South", 2)
+        index.add("B10", 3)
+        assert index.lookup("a55") == 1
+        assert index.lookup("A55 - S") == 2
+        assert index.lookup("b") == 3
+        assert index.lookup("C") is None
+        assert len(index) == 3
+
+    def test_get_location_id_uses_preloaded_index(self) -> None:
+        with patch.dict(
+            os.environ,
+            {
+                "SNIPEIT_URL": "https://snipe.example.com/api/v1",
+                "SNIPEIT_API_TOKEN": "token",
+            },
+            clear=False,
+        ):
+            c = SnipeITClient(_test_config(checkout_mode="location"))
+            c._iter_rows = MagicMock(  # type: ignore[method-assign]
+                return_value=iter([{"id": 9, "name": "A55 - somewhere"}])
+            )
+            c.preload_location_index()
+            assert c.get_location_id("a55@domain.com", prefix_len=3) == 9
+            assert c.get_location_id("zzz@domain.com", prefix_len=3) is None
+            c._iter_rows.assert_called_once()
+
+    def test_location_map_file_bypasses_api(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        map_file = tmp_path / "locations.json"
+        map_file.write_text('{"A55": 12, "bad": "x"}', encoding="utf-8")
+        with patch.dict(
+            os.environ,
+            {
+                "SNIPEIT_URL": "https://snipe.example.com/api/v1",
+                "SNIPEIT_API_TOKEN": "token",
+            },
+            clear=False,
+        ):
+            c = SnipeITClient(_test_config(location_map_file=str(map_file)))
+            c._session = MagicMock()
+            assert c.get_location_id("a55@domain.com", prefix_len=3) == 12
+            c._session.get.assert_not_called()
+
     def test_create_checks_out_to_location_on_create(self) -> None:
         snipe = MagicMock()
         snipe.ensure_asset_for_sync.return_value = None
@@ -498,6 +1265,102 @@ class TestSyncDeviceOutcomes:
         snipe.checkout_asset.assert_not_called()
 
 
+class TestAssetPayloadChanges:
+    _EXISTING = {
+        "id": 10,
+        "name": "pc",
+        "serial": "SN1",
+        "model": {"id": 2, "name": "XPS"},
+        "status_label": {"id": 3, "name": "Ready to Deploy"},
+        "manufacturer": {"id": 1, "name": "Dell"},
+        "byod": True,
+        "notes": "Intune: Dell XPS | OS 11 | last sync 2024-01-01T00:00:00Z",
+        "custom_fields": {"OS Version": {"field": "_snipeit_os_1", "value": "11"}},
+    }
+
+    def _payload(self, config: SyncConfig, **device: object) -> dict:
+        dev = {
+            "osVersion": "11",
+            "lastSyncDateTime": "2024-02-02T00:00:00Z",
+            "managedDeviceOwnerType": "personal",
+        }
+        dev.update(device)
+        return _build_asset_payload(
+            dev,
+            device_name="pc",
+            serial="SN1",
+            man_id=1,
+            mod_id=2,
+            status_id=3,
+            config=config,
+            man_name="Dell",
+            mod_number="XPS",
+            checkout_mode="user",
+            checkout_target_id=None,
+            for_create=False,
+        )
+
+    def test_no_changes_with_stable_notes_policy(self) -> None:
+        config = _test_config(custom_fields={"osVersion": "_snipeit_os_1"})
+        payload = self._payload(config)
+        assert _asset_payload_changes(payload, self._EXISTING, config) == []
+
+    def test_volatile_notes_count_under_always_policy(self) -> None:
+        config = _test_config(
+            custom_fields={"osVersion": "_snipeit_os_1"}, notes_change_policy="always"
+        )
+        payload = self._payload(config)
+        assert _asset_payload_changes(payload, self._EXISTING, config) == ["notes"]
+
+    def test_detects_field_and_custom_field_changes(self) -> None:
+        config = _test_config(custom_fields={"osVersion": "_snipeit_os_1"})
+        payload = self._payload(config, osVersion="12")
+        payload["status_id"] = 4
+        assert sorted(_asset_payload_changes(payload, self._EXISTING, config)) == [
+            "_snipeit_os_1",
+            "notes",
+            "status_id",
+        ]
+
+    def test_html_escaped_values_compare_equal(self) -> None:
+        config = _test_config(custom_fields={"osVersion": "_snipeit_os_1"})
+        payload = self._payload(config, osVersion="R&D <x>")
+        existing = {
+            **self._EXISTING,
+            "custom_fields": {
+                "OS Version": {"field": "_snipeit_os_1", "value": "R&amp;D &lt;x&gt;"}
+            },
+        }
+        assert "_snipeit_os_1" not in _asset_payload_changes(payload, existing, config)
+
+    def test_sync_device_skips_patch_when_unchanged(self) -> None:
+        snipe = MagicMock()
+        snipe.ensure_asset_for_sync.return_value = {
+            **self._EXISTING,
+            "notes": "Intune: Dell XPS | last sync 2023-12-01",
+            "byod": False,
+            "custom_fields": {},
+            "assigned_to": {"id": 5},
+        }
+        snipe.get_or_create_manufacturer.return_value = 1
+        snipe.get_or_create_model.return_value = 2
+        snipe.get_user_id.return_value = 5
+        dev = {
+            "deviceName": "pc",
+            "serialNumber": "SN1",
+            "manufacturer": "Dell",
+            "model": "XPS",
+            "userPrincipalName": "user@domain.com",
+            "lastSyncDateTime": "2024-02-02",
+        }
+        outcome = sync_device(
+            snipe, dev, category_id=1, default_status_id=3, config=_test_config()
+        )
+        assert outcome == SyncOutcome.UNCHANGED
+        snipe.update_asset.assert_not_called()
+        snipe.checkout_asset.assert_not_called()
+
+
 class TestLifecycle:
     def test_retire_state_detection(self) -> None:
         assert _device_in_retire_state({"managementState": "wipePending"})
@@ -548,6 +1411,36 @@ class TestLifecycle:
         snipe.checkin_asset.assert_called_once_with(10)
         snipe.apply_lifecycle_update.assert_called_once()
         assert snipe.get_or_create_model.call_count == 0
+        assert dev["_lifecycle"] == "pending_retire"
+
+        snipe.reset_mock()
+        again = sync_device(
+            snipe, dev, category_id=1, default_status_id=2, config=config,
+            status_ids={"pending_retire": 55}, dry_run=False,
+        )
+        assert again == SyncOutcome.LIFECYCLE_UNCHANGED
+        snipe.ensure_asset_for_sync.assert_not_called()
+        snipe.apply_lifecycle_update.assert_not_called()
+
+    def test_stale_device_checked_in_once(self) -> None:
+        snipe = MagicMock()
+        snipe.ensure_asset_for_sync.return_value = {"id": 10, "assigned_to": {"id": 1}}
+        snipe.checkin_asset.return_value = True
+        dev = {
+            "deviceName": "pc",
+            "serialNumber": "SN1",
+            "lastSyncDateTime": "2020-01-01T00:00:00Z",
+        }
+        config = _test_config(stale_days=30)
+        first = sync_device(snipe, dev, category_id=1, default_status_id=2, config=config)
+        assert first == SyncOutcome.CHECKED_IN_STALE
+        assert _sync_state_entry(dev, first)["lifecycle"] == "checked_in_stale"
+
+        snipe.reset_mock()
+        second = sync_device(snipe, dev, category_id=1, default_status_id=2, config=config)
+        assert second == SyncOutcome.SKIPPED_STALE
+        snipe.ensure_asset_for_sync.assert_not_called()
+        snipe.checkin_asset.assert_not_called()
 
     def test_reconcile_archived_when_missing_from_intune(self) -> None:
         snipe = MagicMock()
@@ -582,6 +1475,131 @@ class TestLifecycle:
         assert call_kw["archived"] is True
         assert call_kw["status_id"] == 88
 
+    def test_reconcile_acts_only_on_transitions(self) -> None:
+        snipe = MagicMock()
+        snipe.ensure_asset_for_sync.return_value = {"id": 20}
+        snipe.apply_lifecycle_update.return_value = True
+        config = _test_config(
+            sync_state_file="/tmp/state.json",
+            lifecycle_reconciliation=True,
+        )
+        previous = {
+            "SN8": {"platform": "ios", "lifecycle": "archived"},
+            "SN9": {"platform": "windows", "lifecycle": "pending_autopilot"},
+        }
+        sync_state: dict = {}
+        counts = reconcile_missing_devices(
+            snipe,
+            config,
+            previous,
+            current_intune_serials=set(),
+            autopilot_by_serial={},
+            platform="all",
+            default_status_id=2,
+            status_ids={"archived": 88, "pending_autopilot": 77},
+            dry_run=False,
+            sync_state=sync_state,
+        )
+        assert counts[SyncOutcome.LIFECYCLE_ARCHIVED] == 1
+        assert counts[SyncOutcome.LIFECYCLE_UNCHANGED] == 1
+        snipe.ensure_asset_for_sync.assert_called_once()
+        assert snipe.ensure_asset_for_sync.call_args[0][0] == "SN9"
+        assert sync_state["SN8"]["lifecycle"] == "archived"
+        assert sync_state["SN8"]["lifecycle_at"]
+        assert sync_state["SN9"]["lifecycle"] == "archived"
+        assert sync_state["SN9"]["asset_id"] == 20
+
+    def _reconcile(self, snipe: MagicMock, previous: dict, sync_state: dict) -> dict:
+        return reconcile_missing_devices(
+            snipe,
+            _test_config(sync_state_file="/tmp/state.json", lifecycle_reconciliation=True),
+            previous,
+            current_intune_serials=set(),
+            autopilot_by_serial={},
+            platform="all",
+            default_status_id=2,
+            status_ids={"archived": 88},
+            dry_run=False,
+            sync_state=sync_state,
+        )
+
+    def test_archived_device_reappearing_is_restored(self) -> None:
+        snipe = MagicMock()
+        snipe.ensure_asset_for_sync.return_value = {"id": 20, "serial": "SN5"}
+        snipe.apply_lifecycle_update.return_value = True
+        now = datetime.now(tz=timezone.utc)
+        previous = {
+            "SN5": {
+                "platform": "windows",
+                "outcome": "updated",
+                "fingerprint": "f",
+                "verified_at": _graph_datetime(now),
+            },
+        }
+        sync_state: dict = {}
+        self._reconcile(snipe, previous, sync_state)
+        entry = sync_state["SN5"]
+        assert entry["lifecycle"] == "archived"
+        config = _test_config(sync_state_file="/tmp/state.json", skip_unchanged_devices=True)
+        assert not _fingerprint_unchanged(entry, "f", config, now)
+
+        snipe.get_or_create_manufacturer.return_value = 1
+        snipe.get_or_create_model.return_value = 2
+        snipe.ensure_asset_for_sync.return_value = {
+            "id": 20, "serial": "SN5", "archived": True,
+        }
+        snipe.update_asset.return_value = True
+        dev = {
+            "id": "d5",
+            "deviceName": "PC5",
+            "serialNumber": "SN5",
+            "manufacturer": "Dell",
+            "model": "X",
+            "_lifecycle": entry["lifecycle"],
+        }
+        outcome = sync_device(
+            snipe, dev, category_id=1, default_status_id=2, config=config, dry_run=False,
+        )
+        assert outcome == SyncOutcome.UPDATED
+        assert snipe.update_asset.call_args[0][1]["archived"] == 0
+        assert _sync_state_entry(dev, outcome)["lifecycle"] is None
+
+    def test_reconcile_marks_serial_without_asset_absent(self) -> None:
+        snipe = MagicMock()
+        snipe.ensure_asset_for_sync.return_value = None
+        sync_state: dict = {}
+        self._reconcile(snipe, {"SN7": {"platform": "ios"}}, sync_state)
+        assert sync_state["SN7"]["lifecycle"] == "absent"
+        snipe.ensure_asset_for_sync.reset_mock()
+        counts = self._reconcile(snipe, dict(sync_state), {})
+        snipe.ensure_asset_for_sync.assert_not_called()
+        assert counts[SyncOutcome.LIFECYCLE_UNCHANGED] == 1
+
+    def test_reconcile_prunes_entries_past_retention(self) -> None:
+        old = _graph_datetime(datetime.now(tz=timezone.utc) - timedelta(days=91))
+        previous = {
+            "OLD": {"platform": "ios", "lifecycle": "absent", "lifecycle_at": old},
+            "NEW": {"platform": "ios", "lifecycle": "archived", "lifecycle_at": "2999-01-01"},
+        }
+        sync_state: dict = {}
+        self._reconcile(MagicMock(), previous, sync_state)
+        assert set(sync_state) == {"NEW"}
+
+    def test_reconcile_drops_serial_after_repeated_failures(self) -> None:
+        snipe = MagicMock()
+        snipe.ensure_asset_for_sync.return_value = {"id": 20}
+        snipe.apply_lifecycle_update.return_value = False
+        state: dict = {"SN6": {"platform": "ios"}}
+        for attempt in range(1, LIFECYCLE_MAX_ATTEMPTS):
+            sync_state: dict = {}
+            counts = self._reconcile(snipe, state, sync_state)
+            assert counts[SyncOutcome.LIFECYCLE_FAILED] == 1
+            assert sync_state["SN6"]["lifecycle_failures"] == attempt
+            state = sync_state
+        sync_state = {}
+        self._reconcile(snipe, state, sync_state)
+        assert "SN6" not in sync_state
+
     def test_reconcile_pending_autopilot_for_windows(self) -> None:
         snipe = MagicMock()
         snipe.ensure_asset_for_sync.return_value = {"id": 21}
@@ -636,6 +1654,88 @@ class TestSnipeRestore:
             assert "/hardware/5/restore" in c._session.post.call_args[0][0]
 
 
+class TestAssetIdLookup:
+    def _client(self) -> SnipeITClient:
+        with patch.dict(
+            os.environ,
+            {
+                "SNIPEIT_URL": "https://snipe.example.com/api/v1",
+                "SNIPEIT_API_TOKEN": "token",
+            },
+            clear=False,
+        ):
+            c = SnipeITClient(_test_config())
+        c._session = MagicMock()
+        c._session.get.return_value.raise_for_status = MagicMock()
+        return c
+
+    def test_uses_remembered_asset_id(self) -> None:
+        c = self._client()
+        c._session.get.return_value.json.return_value = {"id": 7, "serial": "sn1"}
+        asset = c.ensure_asset_for_sync("SN1", config=_test_config(), asset_id=7)
+        assert asset == {"id": 7, "serial": "sn1"}
+        c._session.get.assert_called_once()
+        assert c._session.get.call_args[0][0].endswith("/hardware/7")
+
+    def test_serial_mismatch_falls_back_to_byserial(self) -> None:
+        c = self._client()
+        c._session.get.return_value.json.side_effect = [
+            {"id": 7, "serial": "OTHER"},
+            {"rows": [{"id": 9, "serial": "SN1"}]},
+        ]
+        asset = c.ensure_asset_for_sync("SN1", config=_test_config(), asset_id=7)
+        assert asset == {"id": 9, "serial": "SN1"}
+        assert "/hardware/byserial/SN1" in c._session.get.call_args[0][0]
+
+    def test_404_falls_back_to_byserial(self) -> None:
+        c = self._client()
+        missing = requests.Response()
+        missing.status_code = 404
+        first = MagicMock()
+        first.raise_for_status.side_effect = requests.HTTPError(response=missing)
+        second = MagicMock()
+        second.json.return_value = {"rows": [{"id": 9, "serial": "SN1"}]}
+        c._session.get.side_effect = [first, second]
+        asset = c.ensure_asset_for_sync("SN1", config=_test_config(), asset_id=7)
+        assert asset == {"id": 9, "serial": "SN1"}
+
+    def test_state_entry_records_asset_id(self) -> None:
+        snipe = MagicMock()
+        snipe.get_or_create_manufacturer.return_value = 1
+        snipe.get_or_create_model.return_value = 2
+        snipe.get_user_id.return_value = 11
+        snipe.ensure_asset_for_sync.return_value = {
+            "id": 5,
+            "serial": "SN1",
+            "assigned_to": {"id": 3, "type": "user"},
+        }
+        snipe.update_asset.return_value = True
+        snipe.checkout_asset.return_value = True
+        dev = {
+            "id": "d1",
+            "deviceName": "PC",
+            "serialNumber": "SN1",
+            "manufacturer": "Dell",
+            "model": "X",
+            "userPrincipalName": "u@d.com",
+            "_snipe_asset_id": 5,
+        }
+        outcome = sync_device(
+            snipe, dev, category_id=1, default_status_id=2, config=_test_config(),
+            dry_run=False,
+        )
+        assert outcome == SyncOutcome.UPDATED
+        assert snipe.ensure_asset_for_sync.call_args[1]["asset_id"] == 5
+        entry = _sync_state_entry(dev, outcome)
+        assert entry["asset_id"] == 5
+        assert "assigned_target_id" not in entry
+
+    def test_id_lookup_matches_html_escaped_serial(self) -> None:
+        c = self._client()
+        c._session.get.return_value.json.return_value = {"id": 7, "serial": "SN&amp;1"}
+        assert c.find_asset_by_id(7, "SN&1") == {"id": 7, "serial": "SN&amp;1"}
+
+
 class TestGraphAutopilot:
     def test_fetch_autopilot_by_serial(self) -> None:
         with patch.dict(
@@ -650,11 +1750,11 @@ class TestGraphAutopilot:
             gc = GraphClient()
             gc._token = "tok"
             gc._token_expires_at = __import__("time").time() + 3600
-            gc.get_paginated = MagicMock(
-                return_value=[
+            gc.iter_paginated = MagicMock(  # type: ignore[method-assign]
+                return_value=iter([
                     {"serialNumber": "ABC123", "enrollmentState": "enrolled"},
                     {"serialNumber": "", "enrollmentState": "failed"},
-                ]
+                ])
             )
             result = gc.fetch_autopilot_by_serial()
             assert result == {"abc123": {"serialNumber": "ABC123", "enrollmentState": "enrolled"}}
@@ -680,6 +1780,19 @@ class TestFormatSummary:
 
 
 class TestGraphTokenRefresh:
+    def test_main_stops_background_refresh_on_error(self) -> None:
+        graph = MagicMock()
+        with (
+            patch("sys.argv", ["app.py"]),
+            patch("app.GraphClient", return_value=graph),
+            patch("app._run_sync", side_effect=RuntimeError("boom")),
+            patch.dict(os.environ, {}, clear=True),
+        ):
+            with pytest.raises(RuntimeError):
+                main()
+        graph.start_background_refresh.assert_called_once()
+        graph.stop_background_refresh.assert_called_once()
+
     def test_ensure_auth_skips_while_fresh(self) -> None:
         with patch.dict(
             os.environ,
@@ -697,6 +1810,43 @@ class TestGraphTokenRefresh:
             assert gc._token == "tok"
 
 
+    _ENV = {"AZURE_TENANT_ID": "t", "AZURE_CLIENT_ID": "c", "AZURE_CLIENT_SECRET": "s"}
+
+    def test_msal_app_created_once(self) -> None:
+        with patch.dict(os.environ, self._ENV, clear=False), patch(
+            "app.ConfidentialClientApplication"
+        ) as app_cls:
+            app_cls.return_value.acquire_token_for_client.return_value = {
+                "access_token": "tok",
+                "expires_in": 3600,
+            }
+            gc = GraphClient()
+            gc._ensure_auth()
+            gc._refresh_token()
+            assert app_cls.call_count == 1
+            assert app_cls.call_args[1]["token_cache"] is gc._token_cache
+            assert app_cls.return_value.acquire_token_for_client.call_count == 2
+
+    def test_token_cache_file_round_trip(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        cache_file = str(tmp_path / "msal.json")
+        env = {**self._ENV, "GRAPH_TOKEN_CACHE_FILE": cache_file}
+        with patch.dict(os.environ, env, clear=False), patch(
+            "app.ConfidentialClientApplication"
+        ) as app_cls:
+            def acquire(scopes: list[str]) -> dict:
+                gc._token_cache.has_state_changed = True
+                return {"access_token": "tok", "expires_in": 3600}
+
+            app_cls.return_value.acquire_token_for_client.side_effect = acquire
+            gc = GraphClient()
+            gc._ensure_auth()
+            assert os.path.isfile(cache_file)
+            assert oct(os.stat(cache_file).st_mode & 0o777) == "0o600"
+            with patch.object(SerializableTokenCache, "deserialize") as deserialize:
+                GraphClient()
+            deserialize.assert_called_once()
+
+
 class TestGraphPrimaryUserBatch:
     def test_batch_maps_device_to_upn(self) -> None:
         with patch.dict(
@@ -715,7 +1865,7 @@ class TestGraphPrimaryUserBatch:
             gc._session.request.return_value.json.return_value = {
                 "responses": [
                     {
-                        "id": "0",
+                        "id": "device-1",
                         "status": 200,
                         "body": {
                             "value": [{"userPrincipalName": "primary@domain.com"}]
@@ -728,6 +1878,111 @@ class TestGraphPrimaryUserBatch:
             assert result == {"device-1": "primary@domain.com"}
 
 
+    def test_concurrent_chunks_and_empty_user_cached_as_none(self) -> None:
+        with patch.dict(
+            os.environ,
+            {
+                "AZURE_TENANT_ID": "t",
+                "AZURE_CLIENT_ID": "c",
+                "AZURE_CLIENT_SECRET": "s",
+            },
+            clear=False,
+        ):
+            gc = GraphClient()
+
+            def respond(method: str, url: str, json: dict) -> MagicMock:
+                responses = []
+                for req in json["requests"]:
+                    dev_id = req["url"].split("/")[-2]
+                    users = [] if dev_id == "d3" else [{"userPrincipalName": f"{dev_id}@x.com"}]
+                    status = 500 if dev_id == "d4" else 200
+                    responses.append({"id": req["id"], "status": status, "body": {"value": users}})
+                return MagicMock(json=MagicMock(return_value={"responses": responses}))
+
+            gc._request = MagicMock(side_effect=respond)  # type: ignore[method-assign]
+            ids = [f"d{i}" for i in range(45)]
+            result = gc.fetch_primary_user_upns(ids, max_workers=3)
+            assert gc._request.call_count == 3
+            assert result["d0"] == "d0@x.com"
+            assert result["d44"] == "d44@x.com"
+            assert result["d3"] is None
+            assert "d4" not in result
+
+    def test_cached_primary_upns_reused_until_device_resyncs(self) -> None:
+        previous = {
+            "SN1": {"intune_id": "d1", "last_sync": "t1", "primary_upn": "a@x.com"},
+            "SN2": {"intune_id": "d2", "last_sync": "t1", "primary_upn": None},
+            "SN3": {"intune_id": "d3", "last_sync": "t1", "primary_upn": "c@x.com"},
+            "SN4": {"intune_id": "d4", "last_sync": "t1"},
+        }
+        devices = [
+            {"id": "d1", "serialNumber": "SN1", "lastSyncDateTime": "t1"},
+            {"id": "d2", "serialNumber": "SN2", "lastSyncDateTime": "t1"},
+            {"id": "d3", "serialNumber": "SN3", "lastSyncDateTime": "t2"},
+            {"id": "d4", "serialNumber": "SN4", "lastSyncDateTime": "t1"},
+            {"id": "d5", "serialNumber": "SN5", "lastSyncDateTime": "t1"},
+        ]
+        cached, missing = _cached_primary_upns(devices, previous)
+        assert cached == {"d1": "a@x.com", "d2": None}
+        assert missing == ["d3", "d4", "d5"]
+
+
+class TestGraphBatch:
+    def _client(self) -> GraphClient:
+        with patch.dict(
+            os.environ,
+            {"AZURE_TENANT_ID": "t", "AZURE_CLIENT_ID": "c", "AZURE_CLIENT_SECRET": "s"},
+            clear=False,
+        ):
+            return GraphClient()
+
+    def test_splits_into_envelopes_and_keys_by_caller_id(self) -> None:
+        gc = self._client()
+        gc._post_batch = MagicMock(  # type: ignore[method-assign]
+            side_effect=lambda version, chunk: [
+                {"id": req["id"], "status": 200, "body": {"url": req["url"]}} for req in chunk
+            ]
+        )
+        reqs = [{"id": f"r{i}", "method": "GET", "url": f"/x/{i}"} for i in range(45)]
+        out = gc.batch(reqs, api_version="beta", max_workers=2)
+        assert gc._post_batch.call_count == 3
+        assert all(len(c[0][1]) <= 20 for c in gc._post_batch.call_args_list)
+        assert gc._post_batch.call_args[0][0] == "beta"
+        assert out["r44"]["body"] == {"url": "/x/44"}
+
+    def test_retries_only_throttled_sub_requests_honouring_retry_after(self) -> None:
+        gc = self._client()
+        calls: list[list[str]] = []
+
+        def post(version: str, chunk: list[dict]) -> list[dict]:
+            calls.append([req["id"] for req in chunk])
+            if len(calls) == 1:
+                return [
+                    {"id": "a", "status": 200, "body": {}},
+                    {"id": "b", "status": 429, "headers": {"Retry-After": "7"}},
+                    {"id": "c", "status": 404, "body": {}},
+                ]
+            return [{"id": "b", "status": 200, "body": {"ok": True}}]
+
+        gc._post_batch = MagicMock(side_effect=post)  # type: ignore[method-assign]
+        with patch("app.time.sleep") as sleep:
+            out = gc.batch([{"id": k, "method": "GET", "url": "/u"} for k in "abc"])
+        assert calls == [["a", "b", "c"], ["b"]]
+        sleep.assert_called_once_with(7.0)
+        assert out["b"]["body"] == {"ok": True}
+        assert out["c"]["status"] == 404
+
+    def test_gives_up_after_max_attempts(self) -> None:
+        gc = self._client()
+        gc._post_batch = MagicMock(  # type: ignore[method-assign]
+            return_value=[{"id": "a", "status": 503}]
+        )
+        with patch("app.time.sleep"):
+            out = gc.batch([{"id": "a", "method": "GET", "url": "/u"}])
+        assert out["a"]["status"] == 503
+        assert gc._post_batch.call_count == 5
+
+
 class TestParseGraphDatetime:
     def test_parses_zulu(self) -> None:
         dt = _parse_graph_datetime("2024-01-15T12:00:00Z")
@@ -867,6 +2122,23 @@ class TestGetOrCreateStatusId:
             )
             snipe._post.assert_not_called()
 
+    def test_labels_loaded_once_and_missing_names_remembered(self, caplog) -> None:  # type: ignore[no-untyped-def]
+        with patch.dict(os.environ, self._SNIPE_ENV, clear=False):
+            snipe = SnipeITClient(_test_config())
+            snipe._iter_rows = MagicMock(  # type: ignore[method-assign]
+                return_value=iter([
+                    {"id": 1, "name": "Ready to Deploy"},
+                    {"id": 2, "name": "Archived"},
+                ])
+            )
+            assert snipe.get_status_id("Ready to Deploy") == 1
+            assert snipe.get_status_id("Archived") == 2
+            with caplog.at_level("ERROR", logger="intune2snipe"):
+                assert snipe.get_status_id("Out for Repair") is None
+                assert snipe.get_status_id("Out for Repair") is None
+            assert snipe._iter_rows.call_count == 1
+            assert caplog.text.count("Out for Repair") == 1
+
     def test_dry_run_logs_without_post(self) -> None:
         with patch.dict(os.environ, self._SNIPE_ENV, clear=False):
             snipe = SnipeITClient(_test_config())
@@ -882,3 +2154,235 @@ class TestGetOrCreateStatusId:
                 is None
             )
             snipe._post.assert_not_called()
+
+
+class TestSyncStateStore:
+    def test_json_save_is_atomic_replace(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        path = str(tmp_path / "state.json")
+        save_sync_state(path, {"SN1": {"platform": "windows"}})
+        assert load_sync_state(path) == {"SN1": {"platform": "windows"}}
+        assert not os.path.exists(path + ".tmp")
+
+    def test_json_save_warns_when_directory_unwritable(  # type: ignore[no-untyped-def]
+        self, tmp_path, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        path = str(tmp_path / "missing" / "state.json")
+        with caplog.at_level("WARNING", logger="intune2snipe"):
+            JsonSyncStateStore(path).save({"SN1": {"platform": "windows"}})
+        assert "Could not lock sync state" in caplog.text
+        assert "Could not write sync state" in caplog.text
+
+    def test_sqlite_round_trip_and_deletes(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        path = str(tmp_path / "state.db")
+        store = SqliteSyncStateStore(path)
+        store.record("SN1", {"platform": "windows", "outcome": "created"})
+        store.save({
+            "SN1": {"platform": "windows", "outcome": "created"},
+            "SN2": {"platform": "ios", "outcome": "updated"},
+            "_intune2snipe": {"scopes": {"all": {"watermark": "w"}}},
+        })
+        store.save({"SN2": {"platform": "ios", "outcome": "unchanged"}})
+        store.close()
+
+        reopened = SqliteSyncStateStore(path)
+        assert reopened.load() == {
+            "SN2": {"platform": "ios", "outcome": "unchanged"},
+            "_intune2snipe": {"scopes": {"all": {"watermark": "w"}}},
+        }
+        rows = reopened._conn.execute("SELECT serial, outcome FROM devices").fetchall()
+        assert rows == [("SN2", "unchanged")]
+        mode = reopened._conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+        reopened.close()
+
+    def test_sqlite_record_flushes_in_batches(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        store = SqliteSyncStateStore(str(tmp_path / "state.db"))
+        with patch("app.SQLITE_UPSERT_BATCH", 2):
+            store.record("SN1", {"platform": "windows"})
+            assert store._conn.execute("SELECT COUNT(*) FROM devices").fetchone()[0] == 0
+            store.record("SN2", {"platform": "windows"})
+        assert store._conn.execute("SELECT COUNT(*) FROM devices").fetchone()[0] == 2
+        store.close()
+
+    def test_sqlite_migrates_json_state(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        path = str(tmp_path / "state")
+        save_sync_state(path, {
+            "SN1": {"platform": "windows", "outcome": "created"},
+            "_intune2snipe": {"scopes": {}},
+        })
+        store = SqliteSyncStateStore(path)
+        assert store.load() == {
+            "SN1": {"platform": "windows", "outcome": "created"},
+            "_intune2snipe": {"scopes": {}},
+        }
+        assert os.path.isfile(path + ".json.bak")
+        store.close()
+
+    def test_merge_replaces_only_platform_partition(self) -> None:
+        on_disk = {
+            "W1": {"platform": "windows"},
+            "W2": {"platform": "windows"},
+            "I1": {"platform": "ios", "outcome": "created"},
+            "_intune2snipe": {
+                "scopes": {"ios": {"watermark": "i"}, "windows": {"watermark": "old"}},
+                "group_delta": {"g1": {"delta_link": "a"}},
+            },
+        }
+        run_state = {
+            "W1": {"platform": "windows", "outcome": "updated"},
+            "I1": {"platform": "ios", "outcome": "stale copy"},
+            "_intune2snipe": {
+                "scopes": {"ios": {"watermark": "stale"}, "windows": {"watermark": "new"}},
+                "group_delta": {"g2": {"delta_link": "b"}},
+            },
+        }
+        merged = _merge_sync_state(on_disk, run_state, "windows")
+        assert set(merged) == {"W1", "I1", "_intune2snipe"}
+        assert merged["W1"]["outcome"] == "updated"
+        assert merged["I1"]["outcome"] == "created"
+        meta = merged["_intune2snipe"]
+        assert meta["scopes"] == {"ios": {"watermark": "i"}, "windows": {"watermark": "new"}}
+        assert set(meta["group_delta"]) == {"g1", "g2"}
+
+    def test_json_store_keeps_other_platforms(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        path = str(tmp_path / "state.json")
+        save_sync_state(path, {"I1": {"platform": "ios"}, "W9": {"platform": "windows"}})
+        JsonSyncStateStore(path).save({"W1": {"platform": "windows"}}, platform="windows")
+        assert load_sync_state(path) == {
+            "I1": {"platform": "ios"},
+            "W1": {"platform": "windows"},
+        }
+        assert os.path.isfile(path + ".lock")
+
+    def test_sqlite_store_keeps_other_platforms(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        path = str(tmp_path / "state.db")
+        first = SqliteSyncStateStore(path)
+        first.load()
+        second = SqliteSyncStateStore(path)
+        second.load()
+        first.save({"I1": {"platform": "ios"}}, platform="ios")
+        second.save({"W1": {"platform": "windows"}}, platform="windows")
+        first.close()
+        second.close()
+        store = SqliteSyncStateStore(path)
+        assert store.load() == {"I1": {"platform": "ios"}, "W1": {"platform": "windows"}}
+        store.close()
+
+    def test_backend_env(self) -> None:
+        with patch.dict(os.environ, {"SYNC_STATE_BACKEND": "SQLite"}, clear=True):
+            assert SyncConfig.from_env().sync_state_backend == "sqlite"
+        with patch.dict(os.environ, {"SYNC_STATE_BACKEND": "redis"}, clear=True):
+            assert SyncConfig.from_env().sync_state_backend == "json"
+
+
+class TestCheckpoint:
+    _NOW = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+    def test_checkpoint_round_trip_keeps_previous_entries(self) -> None:
+        previous = {
+            "OLD": {"platform": "ios"},
+            "_intune2snipe": {"scopes": {"windows": {"watermark": "w"}}},
+        }
+        state = _checkpoint_state(
+            previous, {"SN1": {"outcome": "created"}}, "windows", {"SN1": "created"},
+            started=self._NOW,
+        )
+        assert state["OLD"] == {"platform": "ios"}
+        assert state["SN1"] == {"outcome": "created"}
+        scope = state["_intune2snipe"]["scopes"]["windows"]
+        assert scope["watermark"] == "w"
+        assert _resume_checkpoint(state, "windows") == {"SN1": "created"}
+        assert _resume_checkpoint(state, "ios") == {}
+        assert "checkpoint" not in previous["_intune2snipe"]["scopes"]["windows"]
+
+    def test_finished_run_clears_checkpoint(self) -> None:
+        state = _checkpoint_state({}, {}, "all", {"SN1": "updated"}, started=self._NOW)
+        meta = _updated_state_meta(state, "all", [], full_sweep=True, now=self._NOW)
+        assert "checkpoint" not in meta["scopes"]["all"]
+
+    def test_interrupted_sync_does_not_drain_queue(self) -> None:
+        import time as _time
+
+        started: list[str] = []
+
+        def sync_one(dev: dict) -> SyncOutcome:
+            started.append(dev["serialNumber"])
+            _time.sleep(0.01)
+            return SyncOutcome.UPDATED
+
+        def stop(dev: dict, outcome: SyncOutcome) -> None:
+            raise SystemExit(143)
+
+        devices = [{"serialNumber": f"SN{i}"} for i in range(50)]
+        with pytest.raises(SystemExit):
+            run_device_sync(devices, sync_one, workers=2, on_result=stop)
+        assert len(started) < 50
+
+    def test_checkpoint_interval_env(self) -> None:
+        with patch.dict(os.environ, {"SYNC_CHECKPOINT_INTERVAL": "25"}, clear=True):
+            assert SyncConfig.from_env().checkpoint_interval == 25
+
+    def test_checkpoint_interval_default_depends_on_backend(self) -> None:
+        with patch.dict(os.environ, {}, clear=True):
+            assert SyncConfig.from_env().checkpoint_interval == 0
+        with patch.dict(os.environ, {"SYNC_STATE_BACKEND": "sqlite"}, clear=True):
+            assert SyncConfig.from_env().checkpoint_interval == 100
+
+    def test_failed_outcomes_are_retried_on_resume(self) -> None:
+        state = _checkpoint_state(
+            {},
+            {},
+            "all",
+            {"SN1": "updated", "SN2": "update_failed", "SN3": "lifecycle_failed"},
+            started=self._NOW,
+        )
+        assert _resume_checkpoint(state, "all") == {"SN1": "updated"}
+
+
+class TestRunDeviceSync:
+    def test_outcomes_keep_device_order_with_workers(self) -> None:
+        import time as _time
+
+        devices = [{"serialNumber": f"SN{i}", "delay": (5 - i) * 0.01} for i in range(5)]
+
+        def sync_one(dev: dict) -> SyncOutcome:
+            _time.sleep(dev["delay"])
+            return SyncOutcome.CREATED if dev["serialNumber"] == "SN0" else SyncOutcome.UPDATED
+
+        seen: list[str] = []
+        outcomes = run_device_sync(
+            devices, sync_one, workers=4, on_result=lambda d, o: seen.append(d["serialNumber"])
+        )
+        assert outcomes == [SyncOutcome.CREATED] + [SyncOutcome.UPDATED] * 4
+        assert seen == [f"SN{i}" for i in range(5)]
+
+    def test_sync_workers_env_and_cli_override(self) -> None:
+        with patch.dict(os.environ, {"SYNC_WORKERS": "8"}, clear=True):
+            assert SyncConfig.from_env().workers == 8
+            assert SyncConfig.from_env(workers_cli=2).workers == 2
+        with patch.dict(os.environ, {"SYNC_WORKERS": "0"}, clear=True):
+            assert SyncConfig.from_env().workers == 1
+
+    def test_http_session_pool_sized_for_workers(self) -> None:
+        adapter = _http_session(32).get_adapter("https://snipe.example.com")
+        assert adapter._pool_maxsize == 32
+
+    def test_user_cache_resolves_once_across_threads(self) -> None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with patch.dict(
+            os.environ,
+            {
+                "SNIPEIT_URL": "https://snipe.example.com/api/v1",
+                "SNIPEIT_API_TOKEN": "token",
+            },
+            clear=False,
+        ):
+            c = SnipeITClient(_test_config(workers=4))
+            c._iter_rows = MagicMock(  # type: ignore[method-assign]
+                side_effect=lambda *_a, **_k: iter([{"id": 3, "email": "u@d.com"}])
+            )
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                ids = list(pool.map(c.get_user_id, ["u@d.com"] * 8))
+            assert ids == [3] * 8
+            assert c._iter_rows.call_count == 1